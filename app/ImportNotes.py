@@ -16,7 +16,8 @@ with open('../src/paths.json') as f:
 
 schedule_path = paths[category]['schedule']
 cards_path = paths[category]['cards']
+store_path = paths[category]['store']
 notes_paths = paths[category]['notes']
 
-stack = Stack(schedule_path=schedule_path, cards_path=cards_path)
+stack = Stack(schedule_path=schedule_path, cards_path=cards_path, store_path=store_path)
 stack.import_cards(json_path=notes_paths)
\ No newline at end of file
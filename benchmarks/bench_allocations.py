@@ -0,0 +1,113 @@
+# Measures with tracemalloc the memory allocated by the paths that used to deep-copy their data:
+# `StackOrganizer`, `EnglishDictionaryReader.get_word_entry_list` and `Collins_entry.parse`, each against the same work followed by the old deep copies.
+# Run `python benchmarks/bench_allocations.py`. The data is synthetic.
+import json
+import sys
+import tempfile
+import tracemalloc
+from copy import deepcopy
+from pathlib import Path
+
+sys.path.insert(1, str(Path(__file__).parents[1] / 'src'))
+
+from Collins import Collins_entry
+from DictionaryReader import EnglishDictionaryReader, WordEntry
+from toolboxes import StackOrganizer
+
+card_count = 5000
+word_count = 5000
+parse_count = 500
+
+
+def measure(function):
+    '''
+    Returns the peak and the retained number of bytes allocated by `function`, whose result is kept alive until it is measured.
+    '''
+    tracemalloc.start()
+    result = function()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak, current
+
+
+def make_stack(n:int) -> dict:
+    return {f'word{i}-n': {'word': f'word{i // 2}', 'part of speech': 'noun', 'British received pronunciation': 'wɜːd',
+                           'forms': 'words', 'definition': f'The definition of the word {i}.', 'Chinese': '词', 'explanation': '',
+                           'examples': [{'English': f'An example of the word {i}.', 'Chinese': '例子'} for _ in range(3)],
+                           'collocations': {'verb': [{'key': 'use', 'example': {'English': 'Use the word.', 'Chinese': '用'}}]},
+                           'patterns': [{'usage': 'word of', 'example': {'English': 'A word of advice.', 'Chinese': '建议'}}]} for i in range(n)}
+
+
+def organize_with_deepcopy(stack:dict) -> dict:
+    stack = deepcopy(stack)
+    result = {}
+    for card_id in stack:
+        result.setdefault(stack[card_id]['word'], []).append(stack[card_id])
+    return result
+
+
+def make_dictionary(n:int) -> dict:
+    return {f'word{i}': [f'word{i}s', [{'definition': f'The definition {j} of the word {i}.', 'part_of_speech': 'noun',
+                                        'example_sentences': [f'Example {k} of the word {i}.' for k in range(3)]} for j in range(3)]]
+            for i in range(n)}
+
+
+def read_with_deepcopy(dictionary:dict, word_list:list) -> list:
+    word_entry_list = []
+    for word in word_list:
+        word_entry = WordEntry(word)
+        conjugations, definition_items = dictionary[word]
+        for definition_item in definition_items:
+            definition_entry = {'conjugation': conjugations, 'definition': definition_item['definition'], 'examples': definition_item['example_sentences'],
+                                'part of speech': definition_item['part_of_speech'], 'usage': ''}
+            word_entry.definition_entries.append(deepcopy(definition_entry))
+        word_entry_list.append(deepcopy(word_entry))
+    return word_entry_list
+
+
+def read_with_records(json_path:Path, word_list:list) -> list:
+    return EnglishDictionaryReader(json_path, word_list).get_word_entry_list()
+
+
+def read_dictionary(json_path:Path, word_list:list) -> list:
+    with open(json_path) as file:
+        dictionary = json.load(file)
+    return read_with_deepcopy(dictionary, word_list)
+
+
+collins_html = ('<div class="entry_container"><div class="entry lang_en-gb"><h1 class="hwd">bank</h1><span class="inflected_forms">'
+                '<span class="orth">banks</span></span>' +
+                ''.join(f'<div class="hom"><span class="gramGrp pos">noun</span><div class="sense"><span class="def">Definition {i} of a bank.</span>'
+                        f'<span class="cit type-example"><span class="quote">An example {i} of a bank.</span></span></div></div>' for i in range(10)) +
+                '</div></div>')
+
+
+def parse_entries(copy:bool) -> list:
+    entries = []
+    for _ in range(parse_count):
+        entry = Collins_entry('bank').parse({'entryContent': collins_html})
+        entries.append(deepcopy(entry) if copy else entry)
+    return entries
+
+
+def main():
+    results = dict()
+    stack = make_stack(card_count)
+    results[f'StackOrganizer, {card_count} cards'] = (measure(lambda: organize_with_deepcopy(stack)),
+                                                      measure(lambda: StackOrganizer(stack).reorganize()))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = Path(tmp_dir) / 'dictionary.json'
+        with open(json_path, 'w') as file:
+            json.dump(make_dictionary(word_count), file)
+        word_list = [f'word{i}' for i in range(word_count)]
+        results[f'EnglishDictionaryReader, {word_count} words'] = (measure(lambda: read_dictionary(json_path, word_list)),
+                                                                    measure(lambda: read_with_records(json_path, word_list)))
+    results[f'Collins_entry.parse, {parse_count} entries'] = (measure(lambda: parse_entries(copy=True)), measure(lambda: parse_entries(copy=False)))
+    print('Allocations in MiB, peak / retained')
+    for name, ((copy_peak, copy_current), (peak, current)) in results.items():
+        print(f'{name:>38}: deep copies {copy_peak / 1024 ** 2:7.2f} / {copy_current / 1024 ** 2:7.2f}, now {peak / 1024 ** 2:7.2f} / {current / 1024 ** 2:7.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# Compares the sizes of the AnkiConnect responses needed to find the cards of a deck due in n days:
+# the old collection-wide search with `cardsInfo`, the same search scoped to the deck, and the deck-scoped `notesInfo` used by `AnkiCommunicator`.
+# Run `python benchmarks/bench_anki_payload.py --deck "<deck>"` with Anki open, or `python benchmarks/bench_anki_payload.py --synthetic`
+# to run it against the fake AnkiConnect of the tests with synthetic decks.
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+sys.path.insert(1, str(Path(__file__).parents[1] / 'src'))
+
+from toolboxes import AnkiCommunicator
+
+
+def invoke(session:requests.Session, url:str, action:str, params:dict):
+    '''
+    Returns the result of the action and the number of bytes of the response.
+    '''
+    response = session.post(url, data=json.dumps({'action': action, 'params': params, 'version': 6}))
+    response_json = response.json()
+    assert not response_json.get('error'), response_json.get('error')
+    return response_json['result'], len(response.content)
+
+
+def measure(session:requests.Session, url:str, steps:list):
+    '''
+    Runs the steps, functions taking the result of the previous step and returning a tuple (action, params), and returns the bytes received and the seconds spent.
+    '''
+    total_bytes = 0
+    start = time.perf_counter()
+    result = None
+    for step in steps:
+        action, params = step(result)
+        if params.get('cards') == [] or params.get('notes') == []:
+            break
+        result, size = invoke(session, url, action, params)
+        total_bytes += size
+    return total_bytes, time.perf_counter() - start
+
+
+def make_synthetic_anki(decks:int, cards_per_deck:int):
+    sys.path.insert(1, str(Path(__file__).parents[1] / 'tests'))
+    from conftest import FakeAnki
+    fake = FakeAnki()
+    for deck_index in range(decks):
+        for card_index in range(cards_per_deck):
+            anki_card_id = deck_index * cards_per_deck + card_index
+            fake.add_card(anki_card_id, f'Deck {deck_index}', f'word{anki_card_id}-n', due_in=card_index % 10)
+    return fake
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AnkiConnect response-size benchmark')
+    parser.add_argument('--url', default='http://localhost:8765', help='the url of AnkiConnect')
+    parser.add_argument('--deck', default='Deck 0', help='the deck to search')
+    parser.add_argument('--days', default=1, type=int, help='the number of days until the cards are due')
+    parser.add_argument('--synthetic', action='store_true', help='run against a fake AnkiConnect with 10 decks of 2000 cards')
+    args = parser.parse_args()
+    fake = make_synthetic_anki(decks=10, cards_per_deck=2000) if args.synthetic else None
+    url = fake.url if fake is not None else args.url
+    anki = AnkiCommunicator(base_url=url)
+    deck_query = anki._get_deck_query(args.deck)
+    session = requests.Session()
+    paths = {
+        'collection-wide findCards + cardsInfo': [lambda _: ('findCards', {'query': f'prop:due={args.days}'}),
+                                                  lambda card_ids: ('cardsInfo', {'cards': card_ids})],
+        'deck-scoped findCards + cardsInfo': [lambda _: ('findCards', {'query': f'{deck_query} prop:due={args.days}'}),
+                                              lambda card_ids: ('cardsInfo', {'cards': card_ids})],
+        'deck-scoped findNotes + notesInfo': [lambda _: ('findNotes', {'query': f'{deck_query} prop:due={args.days}'}),
+                                              lambda note_ids: ('notesInfo', {'notes': note_ids})]
+    }
+    print(f'Cards of {args.deck} due in {args.days} days')
+    for name, steps in paths.items():
+        total_bytes, seconds = measure(session, url, steps)
+        print(f'{name:>38}: {total_bytes / 1024:10.1f} KiB in {seconds:.3f}s')
+    anki.get_words_in_n_days(args.days, args.deck)
+    print(f'{"AnkiCommunicator.get_words_in_n_days":>38}: {sum(size for _, size in anki.response_sizes) / 1024:10.1f} KiB in {len(anki.response_sizes)} requests')
+    if fake is not None:
+        fake.close()
+
+
+if __name__ == '__main__':
+    main()
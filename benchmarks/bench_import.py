@@ -0,0 +1,54 @@
+# Measures the time it takes to import the modules of src in a fresh interpreter, and the time it takes to load the spaCy model,
+# which utils and Exercise used to do at import time.
+# Run `python benchmarks/bench_import.py`, or `python benchmarks/bench_import.py --src <folder>` to measure the src folder of another checkout,
+# e.g. one made by `git worktree add`, to compare the startup before and after a change.
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+modules = ['utils', 'toolboxes', 'ExerciseWriter', 'VocabNotes', 'Exercise']
+timing_code = '''
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+'''
+model_code = '''
+import time
+start = time.perf_counter()
+import spacy
+spacy.load('en_core_web_sm')
+print(time.perf_counter() - start)
+'''
+
+
+def time_code(code:str, cwd:Path, repeat:int):
+    '''
+    Runs `code` in `repeat` fresh interpreters and returns the median of the seconds it prints, or the last line of the error if it failed.
+    '''
+    seconds = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', code], cwd=cwd, capture_output=True, text=True)
+        if result.returncode != 0:
+            return result.stderr.strip().splitlines()[-1]
+        seconds.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import-time benchmark')
+    parser.add_argument('--src', default=Path(__file__).parents[1] / 'src', type=Path, help='the src folder to measure')
+    parser.add_argument('--repeat', default=5, type=int, help='the number of fresh interpreters per module')
+    args = parser.parse_args()
+    print(f'Import times of {args.src.resolve()} (median of {args.repeat} runs)')
+    for module in modules:
+        result = time_code(timing_code.format(module=module), cwd=args.src, repeat=args.repeat)
+        print(f'{module:>16}: ' + (f'{result:.3f}s' if isinstance(result, float) else f'failed ({result})'))
+    result = time_code(model_code, cwd=args.src, repeat=1)
+    print(f'{"spaCy model load":>16}: ' + (f'{result:.3f}s' if isinstance(result, float) else f'failed ({result})'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# Measures with tracemalloc the memory held by a synthetic stack of cards and by word entries, as the dictionaries of the json files and as slotted records.
+# Run `python benchmarks/bench_records.py`.
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(1, str(Path(__file__).parents[1] / 'src'))
+
+from Records import Card, DefinitionEntry
+
+card_count = 20000
+
+
+def measure(function):
+    '''
+    Returns the number of bytes still allocated by `function` when it returns, i.e. held by its result, and its peak.
+    '''
+    tracemalloc.start()
+    result = function()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, peak
+
+
+def make_cards_json(n:int) -> str:
+    return json.dumps({f'word{i}-n': {'word': f'word{i}', 'part of speech': 'noun', 'British received pronunciation': 'wɜːd', 'forms': 'words',
+                                      'definition': f'The definition of the word {i}.', 'Chinese': '词', 'explanation': '',
+                                      'examples': [{'English': f'Example {j} of the word {i}.', 'Chinese': '例子'} for j in range(3)],
+                                      'collocations': {'verb': [{'key': 'use', 'example': {'English': f'Use the word {i}.', 'Chinese': '用'}}]},
+                                      'patterns': [{'usage': 'word of', 'example': {'English': f'A word {i} of advice.', 'Chinese': '建议'}}]}
+                       for i in range(n)}, ensure_ascii=False)
+
+
+def make_definition_entries_json(n:int) -> str:
+    return json.dumps([{'part of speech': 'noun', 'conjugation': f'word{i}s', 'definition': f'The definition of the word {i}.', 'usage': '',
+                        'examples': [f'Example {j} of the word {i}.' for j in range(3)]} for i in range(n)])
+
+
+def main():
+    cards_json = make_cards_json(card_count)
+    entries_json = make_definition_entries_json(card_count)
+    results = {
+        f'{card_count} cards': (measure(lambda: json.loads(cards_json)),
+                                measure(lambda: {card_id: Card.from_dict(card) for card_id, card in json.loads(cards_json).items()})),
+        f'{card_count} definition entries': (measure(lambda: json.loads(entries_json)),
+                                             measure(lambda: [DefinitionEntry.from_dict(entry) for entry in json.loads(entries_json)]))
+    }
+    print('Memory in MiB, held / peak while loading')
+    for name, ((dict_current, dict_peak), (record_current, record_peak)) in results.items():
+        print(f'{name:>26}: dictionaries {dict_current / 1024 ** 2:6.2f} / {dict_peak / 1024 ** 2:6.2f}, '
+              f'records {record_current / 1024 ** 2:6.2f} / {record_peak / 1024 ** 2:6.2f} ({1 - record_current / dict_current:.0%} less held)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# Measures `Configurator.study_n_words` followed by `revert_last_study` on synthetic schedules of 10k and 100k words,
+# against the list-based operations that the Configurator used before (O(N·M) filters and deep copies),
+# and the cost of saving the schedule to the json file and to the card store.
+# Run `python benchmarks/bench_schedule.py`.
+import json
+import sys
+import tempfile
+import timeit
+from copy import deepcopy
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(1, str(Path(__file__).parents[1] / 'src'))
+
+from Stack import CardStore
+from toolboxes import Configurator
+
+sizes = [10000, 100000]
+words_per_study = 1000
+repeat = 3
+
+
+def make_config(size:int) -> dict:
+    words = [f'word{i:06d}-n' for i in range(size)]
+    # A tenth of the words are learned, and have a review state
+    reviews = {word: {'due': str(date.today()), 'interval': 1, 'ease': 2.5, 'repetitions': 0} for word in words[:size // 10]}
+    return {'learned': words[:size // 10], 'unlearned': words[size // 10:], 'last learned': [],
+            'last timestamp': '2000-01-01', 'timestamp': '2000-01-01', 'reviews': reviews}
+
+
+def study_with_lists(config:dict, n:int) -> None:
+    new_word_list = config['unlearned'][:n]
+    review_list = config['learned'] + new_word_list
+    new_list = [word for word in config['unlearned'] if word not in new_word_list]
+    config['learned'] = deepcopy(review_list)
+    config['unlearned'] = deepcopy(new_list)
+    config['last learned'] = new_word_list
+    config['last timestamp'] = config['timestamp']
+    config['timestamp'] = str(date.today())
+
+
+def revert_with_lists(config:dict) -> None:
+    config['timestamp'] = config['last timestamp']
+    config['unlearned'] = config['last learned'] + config['unlearned']
+    config['learned'] = [word for word in config['learned'] if word not in config['last learned']]
+
+
+def study_and_revert(configurator:Configurator, n:int) -> None:
+    configurator.study_n_words(n)
+    configurator.revert_last_study()
+
+
+def main():
+    print(f'Study {words_per_study} words and revert (best of {repeat} runs)')
+    for size in sizes:
+        config = make_config(size)
+        lists_seconds = min(timeit.repeat(lambda: (study_with_lists(config, words_per_study), revert_with_lists(config)), number=1, repeat=repeat))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = Path(tmp_dir) / 'schedule.json'
+            with open(json_path, 'w') as file:
+                json.dump(make_config(size), file)
+            configurator = Configurator(json_path)
+            json_seconds = min(timeit.repeat(lambda: study_and_revert(configurator, words_per_study), number=1, repeat=repeat))
+            store_path = Path(tmp_dir) / 'cards.sqlite'
+            CardStore(store_path).close()
+            stored_configurator = Configurator(json_path, store_path=store_path)
+            store_seconds = min(timeit.repeat(lambda: study_and_revert(stored_configurator, words_per_study), number=1, repeat=repeat))
+            stored_configurator.store.close()
+            # The same without saving the schedule, to separate the operations from the file writes
+            configurator._Configurator__export = lambda **changes: None
+            memory_seconds = min(timeit.repeat(lambda: study_and_revert(configurator, words_per_study), number=1, repeat=repeat))
+        print(f'{size:>7} words: lists {lists_seconds:.3f}s, Configurator {memory_seconds:.3f}s in memory, '
+              f'{json_seconds:.3f}s saving the json file, {store_seconds:.3f}s saving the store')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+
+# Schema of the Anki collection (version 11), which every version of Anki can import
+_collection_schema = '''
+CREATE TABLE col (id integer primary key, crt integer not null, mod integer not null, scm integer not null, ver integer not null,
+                  dty integer not null, usn integer not null, ls integer not null, conf text not null, models text not null,
+                  decks text not null, dconf text not null, tags text not null);
+CREATE TABLE notes (id integer primary key, guid text not null, mid integer not null, mod integer not null, usn integer not null,
+                    tags text not null, flds text not null, sfld integer not null, csum integer not null, flags integer not null,
+                    data text not null);
+CREATE TABLE cards (id integer primary key, nid integer not null, did integer not null, ord integer not null, mod integer not null,
+                    usn integer not null, type integer not null, queue integer not null, due integer not null, ivl integer not null,
+                    factor integer not null, reps integer not null, lapses integer not null, left integer not null, odue integer not null,
+                    odid integer not null, flags integer not null, data text not null);
+CREATE TABLE revlog (id integer primary key, cid integer not null, usn integer not null, ivl integer not null, lastIvl integer not null,
+                     factor integer not null, time integer not null, type integer not null);
+CREATE TABLE graves (usn integer not null, oid integer not null, type integer not null);
+CREATE INDEX ix_notes_usn on notes (usn);
+CREATE INDEX ix_cards_usn on cards (usn);
+CREATE INDEX ix_revlog_usn on revlog (usn);
+CREATE INDEX ix_cards_nid on cards (nid);
+CREATE INDEX ix_cards_sched on cards (did, queue, due);
+CREATE INDEX ix_revlog_cid on revlog (cid);
+CREATE INDEX ix_notes_csum on notes (csum);
+'''
+
+_default_deck_config = {
+    'id': 1, 'name': 'Default', 'mod': 0, 'usn': 0, 'maxTaken': 60, 'autoplay': True, 'timer': 0, 'replayq': True, 'dyn': False,
+    'new': {'bury': True, 'delays': [1, 10], 'initialFactor': 2500, 'ints': [1, 4, 7], 'order': 1, 'perDay': 20, 'separate': True},
+    'lapse': {'delays': [10], 'leechAction': 0, 'leechFails': 8, 'minInt': 1, 'mult': 0},
+    'rev': {'bury': True, 'ease4': 1.3, 'fuzz': 0.05, 'ivlFct': 1, 'maxIvl': 36500, 'minSpace': 1, 'perDay': 100}
+}
+
+_base91_characters = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!#$%&()*+,-./:;<=>?@[]^_`{|}~'
+
+
+def _hash_int(text:str, bits:int) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'big') >> (64 - bits)
+
+
+# Anki reads IDs as creation times in milliseconds. The stable IDs start from 2024-01-01.
+_id_epoch = 1704067200000
+
+
+def get_id(text:str) -> int:
+    '''
+    Returns a stable ID for Anki derived from `text`: the epoch `_id_epoch` plus an offset of at most about 50 days, so that it reads as a plausible creation time.
+    '''
+    return _id_epoch + _hash_int(text, 32)
+
+
+def get_guid(text:str) -> str:
+    '''
+    Returns a stable note GUID derived from `text`, encoded in base 91 like the GUIDs created by Anki.
+    Anki recognises a note by its GUID on import, so notes exported again with the same GUID are updated instead of duplicated.
+    '''
+    number = _hash_int(text, 64)
+    guid = ''
+    while number:
+        number, remainder = divmod(number, len(_base91_characters))
+        guid = _base91_characters[remainder] + guid
+    return guid
+
+
+def _strip_html(text:str) -> str:
+    # Anki's sort field and checksum ignore the html tags
+    result = []
+    in_tag = False
+    for character in text:
+        if character == '<':
+            in_tag = True
+        elif character == '>':
+            in_tag = False
+        elif not in_tag:
+            result.append(character)
+    return ''.join(result)
+
+
+class AnkiPackageWriter:
+    '''
+    Writes notes of the note type `model_name` (fields Front and Back, one card per note) into the deck `deck_name` of an Anki package (.apkg),
+    which Anki imports in one go.
+    The IDs of the note type and the deck, as well as the note GUIDs, are derived from their names and card IDs, so importing a new export
+    of the same cards updates the notes in place. The notes and cards get IDs from the time of the export, which Anki shows as the time they were added.
+
+    Members:
+    apkg_path (Path): The path of the package.
+    deck_name (str): The name of the deck the cards go into.
+    model_name (str): The name of the note type.
+    '''
+    def __init__(self, apkg_path:str, deck_name:str, model_name:str):
+        self.apkg_path = Path(apkg_path)
+        self.deck_name = deck_name
+        self.model_name = model_name
+        self.model_id = get_id('model:' + model_name)
+        self.deck_id = get_id('deck:' + deck_name)
+
+
+    def write(self, notes) -> int:
+        '''
+        Writes the package from an iterable of (card_id, front, back) and returns the number of notes.
+        The notes are inserted as they come, so the iterable can be a generator.
+        '''
+        now = int(time.time())
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            collection_path = os.path.join(tmp_dir, 'collection.anki2')
+            connection = sqlite3.connect(collection_path)
+            connection.executescript(_collection_schema)
+            connection.execute('INSERT INTO col VALUES (1, ?, ?, ?, 11, 0, 0, 0, ?, ?, ?, ?, ?)',
+                               (now, now * 1000, now * 1000, json.dumps(self.__get_collection_config()), json.dumps(self.__get_models(now)),
+                                json.dumps(self.__get_decks(now)), json.dumps({'1': _default_deck_config}), json.dumps({})))
+            note_count = 0
+            first_id = now * 1000
+            for card_id, front, back in notes:
+                note_key = self.model_name + ':' + card_id
+                note_id = first_id + note_count
+                sort_field = _strip_html(front)
+                checksum = int(hashlib.sha1(sort_field.encode('utf-8')).hexdigest()[:8], 16)
+                connection.execute('INSERT INTO notes VALUES (?, ?, ?, ?, -1, ?, ?, ?, ?, 0, ?)',
+                                   (note_id, get_guid(note_key), self.model_id, now, '', front + '\x1f' + back, sort_field, checksum, ''))
+                # A new card (type and queue 0), shown in the order of the notes
+                connection.execute('INSERT INTO cards VALUES (?, ?, ?, 0, ?, -1, 0, 0, ?, 0, 0, 0, 0, 0, 0, 0, 0, ?)',
+                                   (note_id, note_id, self.deck_id, now, note_count, ''))
+                note_count += 1
+            connection.commit()
+            connection.close()
+            tmp_path = self.apkg_path.with_name(self.apkg_path.name + '.tmp')
+            with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as package:
+                package.write(collection_path, 'collection.anki2')
+                package.writestr('media', '{}')
+            os.replace(tmp_path, self.apkg_path)
+        return note_count
+
+
+    def __get_collection_config(self) -> dict:
+        return {'activeDecks': [1], 'addToCur': True, 'collapseTime': 1200, 'curDeck': 1, 'curModel': str(self.model_id), 'dueCounts': True,
+                'estTimes': True, 'newBury': True, 'newSpread': 0, 'nextPos': 1, 'sortBackwards': False, 'sortType': 'noteFld', 'timeLim': 0}
+
+
+    def __get_models(self, now:int) -> dict:
+        fields = [{'name': name, 'ord': i, 'sticky': False, 'rtl': False, 'font': 'Arial', 'size': 20, 'media': []}
+                  for i, name in enumerate(['Front', 'Back'])]
+        template = {'name': 'Card 1', 'ord': 0, 'qfmt': '{{Front}}', 'afmt': '{{FrontSide}}\n\n<hr id=answer>\n\n{{Back}}',
+                    'did': None, 'bqfmt': '', 'bafmt': ''}
+        model = {'id': self.model_id, 'name': self.model_name, 'type': 0, 'mod': now, 'usn': -1, 'sortf': 0, 'did': self.deck_id,
+                 'tmpls': [template], 'flds': fields, 'tags': [], 'vers': [], 'req': [[0, 'any', [0]]],
+                 'css': '.card {\n font-family: arial;\n font-size: 20px;\n text-align: center;\n color: black;\n background-color: white;\n}\n',
+                 'latexPre': '\\documentclass[12pt]{article}\n\\special{papersize=3in,5in}\n\\usepackage[utf8]{inputenc}\n\\usepackage{amssymb,amsmath}\n\\pagestyle{empty}\n\\setlength{\\parindent}{0in}\n\\begin{document}\n',
+                 'latexPost': '\\end{document}'}
+        return {str(self.model_id): model}
+
+
+    def __get_decks(self, now:int) -> dict:
+        decks = dict()
+        for deck_id, name in [(1, 'Default'), (self.deck_id, self.deck_name)]:
+            decks[str(deck_id)] = {'id': deck_id, 'name': name, 'mod': now, 'usn': -1, 'collapsed': False, 'desc': '', 'dyn': 0, 'conf': 1,
+                                   'extendNew': 10, 'extendRev': 50, 'newToday': [0, 0], 'revToday': [0, 0], 'lrnToday': [0, 0], 'timeToday': [0, 0]}
+        return decks
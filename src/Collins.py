@@ -1,42 +1,273 @@
 from skPublish import API
 import json
+import urllib3
 from bs4 import BeautifulSoup
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
 from pathlib import Path
 import time
-from copy import deepcopy
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from breame.spelling import get_american_spelling
 from dotenv import load_dotenv
 import os
-from DictionaryReader import collins_json_path
+import hashlib
+from DictionaryReader import collins_json_path, convert_json_to_indexed, get_indexed_paths
 
 
 load_dotenv(dotenv_path='../../../../../Library/Mobile Documents/com~apple~CloudDocs/Projects/Vocab Builder/vars/.env')
 api_key = os.getenv('COLLINS_API_KEY')
+collins_base_url = 'https://api.collinsdictionary.com/api/v1'
+collins_dictionary_code = 'english-learner'
+
+
+class TokenBucket:
+    '''
+    A thread-safe token-bucket rate limiter.
+
+    Members:
+    self.rate (float): The number of tokens added per second, i.e. the sustained number of requests per second
+    self.burst (int): The maximum number of tokens the bucket can hold, i.e. the number of requests that may be sent back to back
+    '''
+    def __init__(self, rate: float, burst: int=1):
+        assert rate > 0, 'The rate must be positive'
+        assert burst >= 1, 'The burst must be at least 1'
+        self.rate = rate
+        self.burst = burst
+        self.__tokens = float(burst)
+        self.__last = time.monotonic()
+        self.__lock = threading.Lock()
+
+
+    def acquire(self) -> None:
+        '''
+        Blocks until a token is available and takes it.
+        '''
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__tokens = min(self.burst, self.__tokens + (now - self.__last) * self.rate)
+                self.__last = now
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return
+                wait = (1 - self.__tokens) / self.rate
+            time.sleep(wait)
+
+
+class CollinsSession:
+    '''
+    A long-lived client of the Collins API. The connection pool is kept alive between requests and can be shared by several threads.
+
+    Members:
+    self.pool (urllib3.PoolManager): The pool of keep-alive connections, with `pool_size` connections per host
+    self.api (API): The Collins API, sending its requests through `self.pool`
+    self.headers (dict): The headers sent with every request
+    self.latencies (list): The latency in seconds of every request sent so far
+    '''
+    def __init__(self, api_key=api_key, base_url: str=collins_base_url, pool_size: int=4,
+                 connect_timeout: float=5.0, read_timeout: float=30.0):
+        self.headers = {'accessKey': api_key, 'Accept-Encoding': 'gzip', 'Connection': 'keep-alive'}
+        self.pool = urllib3.PoolManager(maxsize=pool_size,
+                                        block=True,
+                                        timeout=urllib3.Timeout(connect=connect_timeout, read=read_timeout),
+                                        retries=False,
+                                        headers=self.headers)
+        self.api = API(baseUrl=base_url, accessKey=api_key, userAgent=self.pool)
+        self.latencies = []
+        self.__lock = threading.Lock()
+
+
+    def search_first(self, dictionary_code: str, search_word: str, entry_format: str=None) -> tuple:
+        '''
+        Returns the HTTP status and the body of the response of `searchFirst`. Raises an exception on a rate-limit or server error so that the caller can retry.
+        '''
+        url = self.api._buildUrl('dictionaries',
+                                 dictionary_code,
+                                 'search',
+                                 'first',
+                                 q=search_word,
+                                 format=entry_format)
+        start = time.perf_counter()
+        response = self.pool.request('GET', url, headers=self.headers)
+        latency = time.perf_counter() - start
+        with self.__lock:
+            self.latencies.append(latency)
+        if response.status == 429 or response.status >= 500:
+            raise Exception(f'The Collins API returned HTTP {response.status}')
+        return response.status, response.data
+
+
+    def get_metrics(self) -> dict:
+        '''
+        Returns the number of requests and their mean, median, 95th percentile and maximum latency in seconds.
+        '''
+        with self.__lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return {'requests': 0}
+        return {
+            'requests': len(latencies),
+            'mean': sum(latencies) / len(latencies),
+            'p50': latencies[len(latencies) // 2],
+            'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            'max': latencies[-1]
+        }
+
+
+class CollinsCache:
+    '''
+    A content-addressed cache of raw Collins API responses on disk.
+    A response is saved in `<sha256 of the key>.json`, where the key is the dictionary code and the American-spelled search word.
+
+    Members:
+    self.cache_dir (Path): The folder of the cached responses
+    self.ttl (float): The number of seconds after which a cached response is refetched. None means never.
+    self.max_bytes (int): The maximum total size of the cache. The least recently written responses are evicted first. None means unlimited.
+    '''
+    def __init__(self, cache_dir: str, ttl: float=365 * 24 * 3600, max_bytes: int=1024 ** 3):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.__size = sum(path.stat().st_size for path in self.cache_dir.glob('*.json'))
+        self.__lock = threading.Lock()
+
+
+    def get(self, dictionary_code: str, search_word: str) -> dict:
+        '''
+        Returns the cached raw entry, or None if it is not cached or has expired.
+        '''
+        path = self.__get_path(dictionary_code, search_word)
+        try:
+            if self.ttl is not None and time.time() - path.stat().st_mtime > self.ttl:
+                return None
+            with open(path) as file:
+                return json.load(file)['raw_entry']
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+
+    def put(self, dictionary_code: str, search_word: str, word: str, raw_entry: dict) -> None:
+        path = self.__get_path(dictionary_code, search_word)
+        record = {
+            'dictionary_code': dictionary_code,
+            'search_word': search_word,
+            'word': word,
+            'fetched_at': time.time(),
+            'raw_entry': raw_entry
+        }
+        data = json.dumps(record, ensure_ascii=False).encode('utf-8')
+        tmp_path = path.with_name(path.name + f'.{threading.get_ident()}.tmp')
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        with self.__lock:
+            old_size = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+            self.__size += len(data) - old_size
+            if self.max_bytes is not None and self.__size > self.max_bytes:
+                self.__evict()
+
+
+    def __iter__(self):
+        '''
+        Yields every cached record, whether or not it has expired.
+        '''
+        for path in sorted(self.cache_dir.glob('*.json')):
+            try:
+                with open(path) as file:
+                    yield json.load(file)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+
+
+    def __evict(self) -> None:
+        paths = sorted(self.cache_dir.glob('*.json'), key=lambda path: path.stat().st_mtime)
+        for path in paths:
+            if self.__size <= self.max_bytes:
+                break
+            self.__size -= path.stat().st_size
+            path.unlink()
+
+
+    def __get_path(self, dictionary_code: str, search_word: str) -> Path:
+        key = f'{dictionary_code}\n{search_word}'.encode('utf-8')
+        return self.cache_dir / f'{hashlib.sha256(key).hexdigest()}.json'
 
 
 class Collins_entry:
     def __init__(self, word:str):
         self.word = word
         self.raw_entry = dict()
+        self.raw_status = None
         self.dictionary = dict()
-        print(f'Looking up the word {self.word}...')
 
     
-    def look_up(self, api_key=api_key) -> dict:
-        time.sleep(3)
-        self.__get_raw_entry(api_key=api_key)
-        self.__parse_headword(raw_entry=self.raw_entry)
+    def look_up(self, api_key=api_key, session:CollinsSession=None, rate_limiter:TokenBucket=None, max_retries:int=3, backoff:float=1.0,
+                cache:CollinsCache=None) -> dict:
+        '''
+        Fetches and parses the entry of the word. If the raw response is cached, no request is sent.
+
+        Args:
+            api_key (str): The Collins API key. It is only used when no session is given.
+            session (CollinsSession, optional): The client sending the requests. A new one is created if it is not given.
+            rate_limiter (TokenBucket, optional): Every request, including retries, takes a token from it first.
+            max_retries (int): The number of retries after a failed request.
+            backoff (float): The delay in seconds before the first retry. It doubles after every retry.
+            cache (CollinsCache, optional): The cache of raw responses to read from and write to.
+        '''
+        search_word = get_american_spelling(self.word)
+        raw_entry = cache.get(collins_dictionary_code, search_word) if cache is not None else None
+        if raw_entry is not None:
+            self.raw_entry = raw_entry
+            return self.parse(raw_entry=self.raw_entry)
+        print(f'Looking up the word {self.word}...')
+        if session is None:
+            session = CollinsSession(api_key=api_key)
+        for attempt in range(max_retries + 1):
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            try:
+                self.__get_raw_entry(session=session, search_word=search_word)
+                break
+            except Exception as e:
+                if attempt == max_retries:
+                    raise
+                delay = backoff * 2 ** attempt
+                print(f'Failed to look up the word {self.word} ({e}). Retrying in {delay:.1f}s...')
+                time.sleep(delay + random.uniform(0, backoff))
+        # Only successful responses are cached, not e.g. the error of an expired key
+        if cache is not None and 200 <= self.raw_status < 300:
+            cache.put(collins_dictionary_code, search_word, word=self.word, raw_entry=self.raw_entry)
+        return self.parse(raw_entry=self.raw_entry)
+
+
+    def parse(self, raw_entry:dict) -> dict:
+        '''
+        Parses a raw response of the API, e.g. one read from a `CollinsCache`, without any network access.
+        '''
+        self.raw_entry = raw_entry
+        self.__parse_headword(raw_entry=raw_entry)
         return self.dictionary
     
 
-    def __get_raw_entry(self, api_key=api_key) -> None:
-        base_url = 'https://api.collinsdictionary.com/api/v1'
-        api = API(baseUrl=base_url, accessKey=api_key)
-        search_word = get_american_spelling(self.word)
-        response = api.searchFirst(dictionaryCode='english-learner', 
-                                            searchWord=search_word, 
-                                            entryFormat='html')
-        self.raw_entry = json.loads(response.decode())
+    def __get_raw_entry(self, session:CollinsSession, search_word:str) -> None:
+        status, response = session.search_first(dictionary_code=collins_dictionary_code, 
+                                                 search_word=search_word, 
+                                                 entry_format='html')
+        self.raw_status = status
+        try:
+            self.raw_entry = json.loads(response.decode())
+        except ValueError:
+            self.raw_entry = dict()
+        if not 200 <= status < 300:
+            print(f'The Collins API returned HTTP {status} for the word {self.word}. The response is not cached.')
+            if 'errorCode' not in self.raw_entry:
+                self.raw_entry = {'errorCode': f'HTTP {status}', 'errorMessage': response.decode(errors='replace')}
 
 
     def __parse_headword(self, raw_entry:dict) -> None:
@@ -44,61 +275,131 @@ class Collins_entry:
             print(f'The word {self.word} can not be found.')
         else:
             html_content = raw_entry['entryContent']
-            soup = BeautifulSoup(html_content, 'html.parser')
-            parsed_data = {
-                'word': None,
-                'conjugations': None,
-                'entries': []
-            }
-            
-            # Extract word
-            parsed_data['word'] = soup.find('h1', {'class': 'hwd'}).text if soup.find('h1', {'class': 'hwd'}) else "Not found"
-
-            # Extract conjugations
-            conjugation_tags = soup.find_all('span', class_='orth')
-            if conjugation_tags is not None:
-                conjugation_list = [tag.string for tag in conjugation_tags]
-                conjugation_list = list(dict.fromkeys(conjugation_list))
-                parsed_data['conjugations'] = ', '.join(conjugation_list)
+            if lxml_html is not None:
+                parsed_data = self.__parse_with_lxml(html_content)
             else:
-                parsed_data['conjugations'] = ''
+                parsed_data = self.__parse_with_soup(html_content)
+            self.dictionary = parsed_data
+
+
+    def __parse_with_lxml(self, html_content:str) -> dict:
+        '''
+        Parses the html in a single walk over the lxml tree. The result is the same as the one of `__parse_with_soup`.
+        '''
+        parsed_data = {
+            'word': None,
+            'conjugations': None,
+            'entries': []
+        }
+        root = lxml_html.fragment_fromstring(html_content, create_parent='div')
+        word = None
+        conjugation_list = []
+        hom_blocks = [] # The spans found in every 'hom' (homograph) block, in document order
+        open_hom_blocks = [] # The 'hom' blocks enclosing the current element
+        for event, element in etree.iterwalk(root, events=('start', 'end')):
+            if not isinstance(element.tag, str):
+                continue
+            classes = element.get('class', '').split()
+            if event == 'end':
+                if element.tag == 'div' and 'hom' in classes:
+                    open_hom_blocks.pop()
+                continue
+            if element.tag == 'div' and 'hom' in classes:
+                hom_block = {'pos': None, 'def': None, 'lbl': None, 'quote': [], 'regional_note': None}
+                hom_blocks.append(hom_block)
+                open_hom_blocks.append(hom_block)
+            elif element.tag == 'h1' and 'hwd' in classes:
+                if word is None:
+                    word = ''.join(element.itertext())
+            elif element.tag == 'span':
+                if 'orth' in classes:
+                    conjugation_list.append(''.join(element.itertext()))
+                for hom_block in open_hom_blocks:
+                    for span_class in ('pos', 'def', 'lbl', 'regional_note'):
+                        if span_class in classes and hom_block[span_class] is None:
+                            hom_block[span_class] = ''.join(element.itertext())
+                    if 'quote' in classes:
+                        hom_block['quote'].append(''.join(element.itertext()))
+
+        parsed_data['word'] = word if word is not None else "Not found"
+        parsed_data['conjugations'] = ', '.join(dict.fromkeys(conjugation_list))
+
+        for hom_block in hom_blocks:
+            entry = {}
+            # If there is no part of speech, jump to the next entry.
+            part_of_speech = hom_block['pos'].strip() if hom_block['pos'] is not None else ''
+            if part_of_speech == '':
+                continue
+            entry['part_of_speech'] = part_of_speech
+            definition = hom_block['def'].strip() if hom_block['def'] is not None else ""
+            definition += (' ' + hom_block['lbl'].strip()) if hom_block['lbl'] is not None else ""
+            if r'[' in definition and r']' not in definition:
+                definition += r']'
+            entry['definition'] = definition.replace('\n', '')
+            entry['example_sentences'] = [quote.strip() for quote in hom_block['quote']]
+            entry['regional_note'] = hom_block['regional_note'].strip() if hom_block['regional_note'] is not None else ""
+            parsed_data['entries'].append(entry)
+        return parsed_data
+
+
+    def __parse_with_soup(self, html_content:str) -> dict:
+        soup = BeautifulSoup(html_content, 'html.parser')
+        parsed_data = {
+            'word': None,
+            'conjugations': None,
+            'entries': []
+        }
+        
+        # Extract word
+        parsed_data['word'] = soup.find('h1', {'class': 'hwd'}).text if soup.find('h1', {'class': 'hwd'}) else "Not found"
+
+        # Extract conjugations
+        conjugation_tags = soup.find_all('span', class_='orth')
+        if conjugation_tags is not None:
+            conjugation_list = [tag.string for tag in conjugation_tags]
+            conjugation_list = list(dict.fromkeys(conjugation_list))
+            parsed_data['conjugations'] = ', '.join(conjugation_list)
+        else:
+            parsed_data['conjugations'] = ''
+        
+        # Loop through each 'hom' (homograph) block
+        for hom_block in soup.find_all('div', {'class': 'hom'}):
+            entry = {}
             
-            # Loop through each 'hom' (homograph) block
-            for hom_block in soup.find_all('div', {'class': 'hom'}):
-                entry = {}
-                
-                # Find part of speech. If there is no part of speech, jump to the next entry.
-                pos_span = hom_block.find('span', {'class': 'pos'})
-                if pos_span:
-                    part_of_speech = pos_span.text.strip()
-                    if part_of_speech != '':
-                        entry['part_of_speech'] = part_of_speech
-                    else: continue
+            # Find part of speech. If there is no part of speech, jump to the next entry.
+            pos_span = hom_block.find('span', {'class': 'pos'})
+            if pos_span:
+                part_of_speech = pos_span.text.strip()
+                if part_of_speech != '':
+                    entry['part_of_speech'] = part_of_speech
                 else: continue
-                
-                # Find definition
-                def_span = hom_block.find('span', {'class': 'def'})
-                definition = def_span.text.strip() if def_span else ""
-                add_span = hom_block.find('span', {'class': 'lbl'})
-                definition += (' ' + add_span.text.strip()) if add_span else ""
-                if r'[' in definition and r']' not in definition:
-                    definition += r']'
-                entry['definition'] = definition.replace('\n', '')
-                
-                # Find example sentences
-                entry['example_sentences'] = [example_span.text.strip() for example_span in hom_block.find_all('span', {'class': 'quote'})]
-                
-                # Find regional notes (assuming they are in a span with class 'regional_note', this might need to be adjusted)
-                regional_note_span = hom_block.find('span', {'class': 'regional_note'})
-                entry['regional_note'] = regional_note_span.text.strip() if regional_note_span else ""
-                
-                # Append this entry to the list of entries
-                parsed_data['entries'].append(entry)
-            self.dictionary = deepcopy(parsed_data)            
+            else: continue
+            
+            # Find definition
+            def_span = hom_block.find('span', {'class': 'def'})
+            definition = def_span.text.strip() if def_span else ""
+            add_span = hom_block.find('span', {'class': 'lbl'})
+            definition += (' ' + add_span.text.strip()) if add_span else ""
+            if r'[' in definition and r']' not in definition:
+                definition += r']'
+            entry['definition'] = definition.replace('\n', '')
+            
+            # Find example sentences
+            entry['example_sentences'] = [example_span.text.strip() for example_span in hom_block.find_all('span', {'class': 'quote'})]
+            
+            # Find regional notes (assuming they are in a span with class 'regional_note', this might need to be adjusted)
+            regional_note_span = hom_block.find('span', {'class': 'regional_note'})
+            entry['regional_note'] = regional_note_span.text.strip() if regional_note_span else ""
+            
+            # Append this entry to the list of entries
+            parsed_data['entries'].append(entry)
+        return parsed_data
 
 
 class Collins_writer:
-    def __init__(self, dictionary_path: str=collins_json_path):
+    def __init__(self, dictionary_path: str=collins_json_path, base_url: str=collins_base_url,
+                 requests_per_second: float=1.0, burst: int=3, max_workers: int=4, max_retries: int=3,
+                 compact_every: int=50, session: CollinsSession=None, cache: CollinsCache=None):
         '''
         Constructor.
 
@@ -107,36 +408,129 @@ class Collins_writer:
         self.dictionary (Dictionary): The dictionary (e.g. Collins)
         self.dic (dict): The python dictionary imported from the json file
         self.new_entries (dict): New words to be attatched to the json file
+        self.session (CollinsSession): The client shared by all lookups. By default it connects to `base_url`, for which a local stub server can be used for testing.
+        self.rate_limiter (TokenBucket): Limits the requests sent to the API to `requests_per_second`, with bursts of up to `burst` requests
+        self.max_workers (int): The maximum number of concurrent lookups
+        self.max_retries (int): The number of retries of a failed lookup
+        self.journal_path (Path): The append-only journal of the new entries that have not been compacted into the json file yet
+        self.compact_every (int): The number of journaled entries after which the journal is compacted into the json file
+        self.cache (CollinsCache): The cache of raw API responses. By default it is the folder `Collins cache` next to the json file.
         '''
+        self.session = session if session is not None else CollinsSession(base_url=base_url, pool_size=max_workers)
+        self.rate_limiter = TokenBucket(rate=requests_per_second, burst=burst)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
         self.dictionary_json = Path(dictionary_path)
+        self.cache = cache if cache is not None else CollinsCache(cache_dir=self.dictionary_json.parent / 'Collins cache')
         if not self.dictionary_json.exists():
             with open(self.dictionary_json, 'w') as json_file:
                 json.dump({}, json_file)
         with open(self.dictionary_json) as json_file:
             self.dic = json.load(json_file)
         self.new_entries = dict()
+        self.journal_path = self.dictionary_json.with_name(self.dictionary_json.name + '.journal')
+        self.compact_every = compact_every
+        self.__journaled_count = 0
+        # Recover the entries journaled by a batch that didn't finish
+        self.__replay_journal()
  
 
     def look_up(self, word_list: list):
-        entry_list = []
-        for word in word_list:
-            entry = dict()
-            if not word in self.dic:
-                # if the word hasn't been in the dictionary
-                collins_entry = Collins_entry(word=word)
-                entry = collins_entry.look_up()
-                if entry:
-                    entry_list.append(deepcopy(entry))
-                else:
-                    print(f'The word {word} has empty entries.')
-            self.new_entries = self.__list_to_dict(entry_list)
-            self.__refresh_dictionary()
+        # Only look up the words that haven't been in the dictionary, each of them once
+        words_to_look_up = [word for word in dict.fromkeys(word_list) if word not in self.dic]
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {executor.submit(self.__look_up_word, word): word for word in words_to_look_up}
+                for future in as_completed(futures):
+                    word = futures[future]
+                    try:
+                        entry = future.result()
+                    except Exception as e:
+                        print(f'Failed to look up the word {word}: {e}')
+                        continue
+                    if entry:
+                        self.new_entries = self.__list_to_dict([entry])
+                        self.__append_to_journal()
+                        if self.__journaled_count >= self.compact_every:
+                            self.__compact()
+                    else:
+                        print(f'The word {word} has empty entries.')
+        finally:
+            if self.__journaled_count > 0:
+                self.__compact()
+        metrics = self.session.get_metrics()
+        if metrics['requests'] > 0:
+            print(f"{metrics['requests']} requests sent so far. Latency: mean {metrics['mean']:.2f}s, p50 {metrics['p50']:.2f}s, p95 {metrics['p95']:.2f}s, max {metrics['max']:.2f}s")
+
+
+    def __look_up_word(self, word: str) -> dict:
+        collins_entry = Collins_entry(word=word)
+        return collins_entry.look_up(session=self.session, rate_limiter=self.rate_limiter, max_retries=self.max_retries, cache=self.cache)
+
+
+    def reparse(self):
+        '''
+        Rebuilds the dictionary from the cached raw responses without any network access, e.g. after a fix of the parser.
+        Entries whose raw responses are not cached are kept as they are.
+        '''
+        reparsed_entries = dict()
+        for record in self.cache:
+            if record['dictionary_code'] != collins_dictionary_code:
+                continue
+            entry = Collins_entry(word=record['word']).parse(raw_entry=record['raw_entry'])
+            if entry:
+                reparsed_entries.update(self.__list_to_dict([entry]))
+        kept_count = len([word for word in self.dic if word not in reparsed_entries])
+        self.dic.update(reparsed_entries)
+        self.__compact()
+        print(f'Reparsed {len(reparsed_entries)} entries from the cache; {kept_count} entries without a cached response were kept.')
     
 
-    def __refresh_dictionary(self):
+    def __append_to_journal(self):
+        '''
+        Makes `self.new_entries` durable by appending them to the journal as one json line.
+        '''
         self.dic.update(self.new_entries)
-        with open(self.dictionary_json, 'w') as json_file:
+        with open(self.journal_path, 'a') as journal_file:
+            journal_file.write(json.dumps(self.new_entries) + '\n')
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        self.__journaled_count += len(self.new_entries)
+
+
+    def __replay_journal(self):
+        if not self.journal_path.exists():
+            return
+        replayed_count = 0
+        with open(self.journal_path) as journal_file:
+            for line in journal_file:
+                try:
+                    entries = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line may have been cut off by a crash
+                    break
+                self.dic.update(entries)
+                replayed_count += len(entries)
+        if replayed_count > 0:
+            print(f'Recovered {replayed_count} entries from {self.journal_path}')
+            self.__compact()
+
+
+    def __compact(self):
+        '''
+        Writes the whole dictionary to a temporary file, atomically renames it over the json file and empties the journal.
+        '''
+        tmp_path = self.dictionary_json.with_name(self.dictionary_json.name + '.tmp')
+        with open(tmp_path, 'w') as json_file:
             json.dump(self.dic, json_file, indent=4)
+            json_file.flush()
+            os.fsync(json_file.fileno())
+        os.replace(tmp_path, self.dictionary_json)
+        # Replaying the journal is idempotent, so a crash before it is emptied loses nothing
+        open(self.journal_path, 'w').close()
+        self.__journaled_count = 0
+        if get_indexed_paths(self.dictionary_json)[1].exists():
+            convert_json_to_indexed(self.dictionary_json)
 
 
     def __list_to_dict(self, l:list) -> dict:
@@ -1,5 +1,8 @@
 import json
-from copy import deepcopy
+import mmap
+import os
+from Records import DefinitionEntry
+from pathlib import Path
 from abc import ABC, abstractmethod
 
 collins_json_path = '../../../../../Library/Mobile Documents/com~apple~CloudDocs/Projects/Vocab Builder/English/Dictionary/Collins.json'
@@ -9,20 +12,124 @@ phrase_json_path = '../../../../../Library/Mobile Documents/com~apple~CloudDocs/
 class WordEntry:
     '''
     The class contains two attributes: `headword` (str) and `definition_entries` (list). 
-    Each member of `definition_entries` is a python dictionary, whose keys are `part of speech`, `conjugation`, `definition`, `usage`, and `examples`
+    Each member of `definition_entries` is a `DefinitionEntry` record, whose keys are `part of speech`, `conjugation`, `definition`, `usage`, and `examples` (a tuple)
     '''
+    __slots__ = ('headword', 'definition_entries')
+
     def __init__(self, word:str) -> None:
         self.headword = word
         self.definition_entries = []
 
 
+class IndexedDictionary:
+    '''
+    A read-only dictionary stored in two files next to the original json file:
+    `<name>.dat` holds the json-encoded entries back to back, and `<name>.idx.json` maps every headword to the byte offset and length of its entry.
+    The payload is memory-mapped, so an entry is only decoded when it is asked for.
+    '''
+    def __init__(self, json_path:str) -> None:
+        self.payload_path, self.index_path = get_indexed_paths(json_path)
+        with open(self.index_path) as file:
+            self.index = json.load(file)
+        self.__file = open(self.payload_path, 'rb')
+        if os.path.getsize(self.payload_path) > 0:
+            self.__payload = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.__payload = b''
+
+
+    def get(self, word:str, default=None):
+        location = self.index.get(word)
+        if location is None:
+            return default
+        offset, length = location
+        return json.loads(self.__payload[offset:offset + length])
+
+
+    def __getitem__(self, word:str):
+        if word not in self.index:
+            raise KeyError(word)
+        return self.get(word)
+
+
+    def __contains__(self, word:str) -> bool:
+        return word in self.index
+
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+    def __iter__(self):
+        return iter(self.index)
+
+
+    def keys(self):
+        return self.index.keys()
+
+
+    def close(self) -> None:
+        if isinstance(self.__payload, mmap.mmap):
+            self.__payload.close()
+        self.__file.close()
+
+
+def get_indexed_paths(json_path:str):
+    '''
+    Returns the paths of the payload file and the index file that belong to the json file `json_path`.
+    '''
+    json_path = Path(json_path)
+    return json_path.with_suffix('.dat'), json_path.with_suffix('.idx.json')
+
+
+def is_indexed_dictionary_up_to_date(json_path:str) -> bool:
+    '''
+    Returns True if the indexed store of `json_path` exists and is not older than the json file.
+    '''
+    payload_path, index_path = get_indexed_paths(json_path)
+    if not (payload_path.exists() and index_path.exists()):
+        return False
+    return index_path.stat().st_mtime >= Path(json_path).stat().st_mtime
+
+
+def convert_json_to_indexed(json_path:str) -> None:
+    '''
+    Converts the json dictionary `json_path` (e.g. Collins.json) into the indexed format read by `IndexedDictionary`.
+    The files are written under temporary names first and then renamed, so a reader never sees a half-written store.
+    '''
+    with open(json_path) as file:
+        dictionary = json.load(file)
+    payload_path, index_path = get_indexed_paths(json_path)
+    payload_tmp = payload_path.with_name(payload_path.name + '.tmp')
+    index_tmp = index_path.with_name(index_path.name + '.tmp')
+    index = dict()
+    offset = 0
+    with open(payload_tmp, 'wb') as file:
+        for word, entry in dictionary.items():
+            data = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+            file.write(data)
+            index[word] = [offset, len(data)]
+            offset += len(data)
+    with open(index_tmp, 'w') as file:
+        json.dump(index, file, ensure_ascii=False)
+    os.replace(payload_tmp, payload_path)
+    os.replace(index_tmp, index_path)
+    print(f'Indexed {len(index)} entries of {json_path}')
+
+
 class DictionaryReader(ABC):
     '''
     Given a list `word_list` of words, the class saves the entries for the words in the dictionary.
+    If an up-to-date indexed store of the json file exists (see `convert_json_to_indexed`), only the requested entries are decoded.
     '''
     def __init__(self, json_path:str, word_list:list) -> None:
-        with open(json_path) as file:
-            self.dictionary = json.load(file)
+        if is_indexed_dictionary_up_to_date(json_path):
+            self.dictionary = IndexedDictionary(json_path)
+        else:
+            if get_indexed_paths(json_path)[1].exists():
+                print(f'The indexed store of {json_path} is out of date. Run `convert_json_to_indexed` to rebuild it.')
+            with open(json_path) as file:
+                self.dictionary = json.load(file)
         self.word_list = word_list
         self.word_entry_list = []
 
@@ -76,9 +183,10 @@ class EnglishDictionaryReader(DictionaryReader):
                     definition_entry['examples'] = examples
                     definition_entry['part of speech'] = part_of_speech
                     definition_entry['usage'] = ''
-                    word_entry.definition_entries.append(deepcopy(definition_entry))
+                    # A read-only record, so the entry can't change the dictionary it shares the conjugations with
+                    word_entry.definition_entries.append(DefinitionEntry.from_dict(definition_entry))
                 
-                self.word_entry_list.append(deepcopy(word_entry))
+                self.word_entry_list.append(word_entry)
             else:
                 print(f'The word {word} does not exist in the json file!')
 
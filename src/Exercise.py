@@ -4,10 +4,7 @@ from copy import deepcopy
 import random
 import prompts
 import json
-import spacy
-from utils import replace_term, string_processing_for_latex, get_gap_length
-
-nlp = spacy.load('en_core_web_sm')
+from utils import replace_terms, string_processing_for_latex, get_gap_length, TextBuffer
 
 
 class Exercise(ABC):
@@ -112,7 +109,8 @@ class FillInTheGapExercise(Exercise):
     
     def _generate_exercise(self, dicts: list):
         exercise_list = [] # A list to store the questions, solutions, and definitions
-        # Add elements to the list exercise_list
+        dialogues = [] # A list to store the preprocessed dialogues and definitions
+        replacements = [] # The replacements of the words in the dialogues, done in one batch
         for dict in dicts:
             word = dict['words'][1]
             conversation = dict['conversation']
@@ -125,18 +123,17 @@ class FillInTheGapExercise(Exercise):
                 dialogue_A = string_processing_for_latex(dialogue_A)
                 dialogue_B = string_processing_for_latex(dialogue_B)
             definition = dict['definitions'][1]
-            dialogue_B_gap, sol_list = replace_term(
-                original_string=dialogue_B,
-                old_value=word,
-                new_value=f'\\fillin[{word}][{get_gap_length(word):.2f}in]'
-            )
+            dialogues.append((dialogue_A, dialogue_B, definition))
+            replacements.append((dialogue_B, word, f'\\fillin[{word}][{get_gap_length(word):.2f}in]'))
+        # Add elements to the list exercise_list
+        for (dialogue_A, dialogue_B, definition), (dialogue_B_gap, sol_list) in zip(dialogues, replace_terms(replacements)):
             if dialogue_B_gap != dialogue_B:
                 question = '\\begin{dialogue} ' + '\\speak{A} ' + dialogue_A + ' \\speak{B} ' + dialogue_B_gap + ' \\end{dialogue}'
                 exercise_list.append((question, ', '.join(sol_list), definition))
         random.shuffle(exercise_list)
         # Write the LaTeX code for the exercise and the solution
-        ex = ''
-        sol = r'\begin{enumerate}' + '\n'
+        ex = TextBuffer()
+        sol = TextBuffer(r'\begin{enumerate}' + '\n')
         for exercise in exercise_list:
             question = exercise[0]
             solution = exercise[1]
@@ -171,8 +168,8 @@ class TranslationExercise(Exercise):
 
     
     def _generate_exercise(self, dicts: list):
-        exercise = ''
-        solution = r'\begin{enumerate}' + '\n'
+        exercise = TextBuffer()
+        solution = TextBuffer(r'\begin{enumerate}' + '\n')
         for dictionary in dicts:
             solution += r'\item ' + string_processing_for_latex(dictionary['English']) + '\n'
             exercise += r'\question ' + dictionary['Chinese'] + '\n'
@@ -226,8 +223,8 @@ class SentenceCorrectionExercise(Exercise):
     
 
     def _generate_exercise(self, dicts: list):
-        exercise = ''
-        solution = r'\begin{enumerate}' + '\n'
+        exercise = TextBuffer()
+        solution = TextBuffer(r'\begin{enumerate}' + '\n')
         for dictionary in dicts:
             correct_sentence = dictionary['new example']
             incorrect_sentence = dictionary['question'].replace(r'[gap]', dictionary['options'][1])
@@ -278,8 +275,8 @@ class UsagePatternExercise(Exercise):
     
 
     def _generate_exercise(self, dicts: list):
-        exercise = ''
-        solution = r'\begin{enumerate}' + '\n'
+        exercise = TextBuffer()
+        solution = TextBuffer(r'\begin{enumerate}' + '\n')
         for dictionary in dicts:
             term = dictionary['term']
             elements = dictionary['elements'] + dictionary['additional elements']
@@ -326,18 +323,12 @@ class VocabMultipleChoiceExercise(Exercise):
 
     
     def _generate_exercise(self, dicts: list):
-        exercise = ''
-        solution = r'\begin{enumerate}' + '\n'
-        for dictionary in dicts:
-            word = dictionary['word']
-            sentence = dictionary['sentence']
+        exercise = TextBuffer()
+        solution = TextBuffer(r'\begin{enumerate}' + '\n')
+        replaced_sentences = replace_terms([(dictionary['sentence'], dictionary['word'], '\\fillin[]') for dictionary in dicts])
+        for dictionary, (question, solution_list) in zip(dicts, replaced_sentences):
             definition = dictionary['definition']
             correct_pronunciation = dictionary['British received pronunciation']
-            question, solution_list = replace_term(
-                original_string=sentence,
-                old_value=word,
-                new_value='\\fillin[]'
-            )
             options = dictionary['similar received pronunciations'] + [correct_pronunciation]
             random.shuffle(options)
             correct_answer_index = options.index(correct_pronunciation)
@@ -393,24 +384,23 @@ class CollocationFillInTheGap(Exercise):
     
     def _generate_exercise(self, dicts: list):
         exercise_list = [] # A list to store the questions and solutions
+        replacements = [] # The replacements of the keys in the collocations, done in one batch
         for dictionary in dicts:
             key = dictionary['key']
+            replacements.append((dictionary['matching part'], key, f'\\fillin[{key}][{get_gap_length(key):.2f}in]'))
+        for dictionary, (incomplete_collocation, sol_list) in zip(dicts, replace_terms(replacements)):
             category = dictionary['category']
-            example = string_processing_for_latex(dictionary['new example'])
+            example = dictionary['new example']
             collocation = dictionary['matching part']
-            incomplete_collocation, sol_list = replace_term(
-                original_string=collocation,
-                old_value=key,
-                new_value=f'\\fillin[{key}][{get_gap_length(key):.2f}in]'
-            )
             if incomplete_collocation != collocation:
+                # The gap is made in the raw text, which is escaped once afterwards
                 question = example.replace(collocation, incomplete_collocation)
                 assert question != example, f'Error: Replacement failed.'
-                question = f' \\textit{{[{category}]}} ' + question
-                exercise_list.append((question, ', '.join(sol_list)))
+                question = f' \\textit{{[{category}]}} ' + string_processing_for_latex(question)
+                exercise_list.append((question, string_processing_for_latex(', '.join(sol_list))))
         random.shuffle(exercise_list)
-        ex = ''
-        sol = r'\begin{enumerate}' + '\n'
+        ex = TextBuffer()
+        sol = TextBuffer(r'\begin{enumerate}' + '\n')
         for exercise in exercise_list:
             ex += '\\question ' + exercise[0] + '\n'
             sol += '\\item ' + exercise[1] + '\n'
@@ -475,8 +465,8 @@ class DialogueCompletionExercise(Exercise):
             question += f' \\textit{{Hint: {hint}}}'
             exercise_list.append((question, solution, topic))
         random.shuffle(exercise_list)
-        ex = ''
-        sol = r'\begin{enumerate}' + '\n'
+        ex = TextBuffer()
+        sol = TextBuffer(r'\begin{enumerate}' + '\n')
         for exercise in exercise_list:
             question = exercise[0]
             solution = exercise[1]
@@ -554,5 +544,6 @@ class ExerciseFactory:
         Returns:
             None
         """
+        # The `Card` records from `StackOrganizer` are immutable, so the copy shares them instead of copying them
         exercise_ = deepcopy(exercise)
         self.exercise_set.append(exercise_)
\ No newline at end of file
@@ -1,8 +1,12 @@
 import jinja2
 from Exercise import Exercise
+from utils import string_processing_for_latex
 from pathlib import Path
+import uuid
 
-# Set up jinja environment
+templates_folder = Path(__file__).parent / 'resources' / 'Templates'
+
+# Set up jinja environment. The compiled templates are kept in memory by the environment and on disk by the bytecode cache.
 
 latex_jinja_env = jinja2.Environment(
     block_start_string = r'\BLOCK{',
@@ -15,8 +19,33 @@ latex_jinja_env = jinja2.Environment(
     line_comment_prefix = '%#',
     trim_blocks = True,
     autoescape = False,
-    loader = jinja2.FileSystemLoader('../src/resources/Templates')
+    loader = jinja2.FileSystemLoader(templates_folder),
+    bytecode_cache = jinja2.FileSystemBytecodeCache()
 )
+# Templates can escape plain text with \VAR{text|latex}
+latex_jinja_env.filters['latex'] = string_processing_for_latex
+
+_precompiled = False
+
+
+def get_template_name(template_path:str) -> str:
+    '''
+    Returns the name of the template under `templates_folder`, e.g. 'Definition/template.tex' for '/Definition/template.tex'.
+    '''
+    return Path(template_path).as_posix().lstrip('/')
+
+
+def precompile_templates():
+    '''
+    Compiles every exercise template under `templates_folder` once, so all the writers share the compiled templates.
+    '''
+    global _precompiled
+    if _precompiled:
+        return
+    for template_name in latex_jinja_env.list_templates(filter_func=lambda name: name.endswith('/template.tex')):
+        latex_jinja_env.get_template(template_name)
+    _precompiled = True
+
 
 def int_to_roman(num):
         """
@@ -51,25 +80,106 @@ def int_to_roman(num):
 
 class ExerciseWriter():
     def __init__(self, template_path:str, output_folder:str):
+        '''
+        Constructor.
+
+        Members:
+        self.template_file (Path): The path of the template relative to `templates_folder`, e.g. '/Definition/template.tex'.
+        self.output_folder (Path): The folder of the rendered files.
+        self.template (jinja2.Template): The compiled template.
+        '''
         self.template_file = Path(template_path)
         self.output_folder = Path(output_folder)
+        precompile_templates()
+        self.template = latex_jinja_env.get_template(get_template_name(template_path))
 
     
     def render_template(self, exercise, set_index:int):
+        # The outputs of a streaming exercise (e.g. `VocabNotes(streaming=True)`) are generators, which are written piece by piece
+        if getattr(exercise, 'streaming', False):
+            self.render_template_streaming(exercise=exercise, set_index=set_index)
+            return
         output_file_path = self.output_folder / f'output_{set_index}.tex'
         output_dict = exercise.get_outputs()
         self.__render_template(output_file_path=output_file_path, 
                                part_name = int_to_roman(set_index),
                                **output_dict
                                )
+
+
+    def render_templates(self, exercises:list, start_index:int=1) -> list:
+        '''
+        Renders the exercises as consecutive sets, the first one with the index `start_index`. Returns the paths of the written files.
+        '''
+        output_file_paths = []
+        for set_index, exercise in enumerate(exercises, start=start_index):
+            self.render_template(exercise=exercise, set_index=set_index)
+            output_file_paths.append(self.output_folder / f'output_{set_index}.tex')
+        return output_file_paths
+        
+    
+    def render_template_streaming(self, exercise, set_index:int, stream_key:str='notes', max_volume_bytes:int=None) -> list:
+        '''
+        Renders the exercise without building the text of the output `stream_key` (e.g. the notes of `VocabNotes(streaming=True)`),
+        whose pieces are written to disk one by one. If `max_volume_bytes` is given, a new volume is started whenever the pieces written
+        to the current one reach that size, and the volumes are written to output_{set_index}-{volume}.tex.
+        Returns the paths of the written files.
+        '''
+        output_dict = dict(exercise.get_outputs())
+        pieces = output_dict.pop(stream_key)
+        # Render the template around a placeholder and split it there
+        sentinel = f'%%STREAM-{uuid.uuid4().hex}%%'
+        head_chunks = []
+        tail_chunks = None
+        for chunk in self.template.generate(part_name=int_to_roman(set_index), **{stream_key: sentinel}, **output_dict):
+            if tail_chunks is None and sentinel in chunk:
+                before, after = chunk.split(sentinel, 1)
+                head_chunks.append(before)
+                tail_chunks = [after]
+            elif tail_chunks is None:
+                head_chunks.append(chunk)
+            else:
+                tail_chunks.append(chunk)
+        assert tail_chunks is not None, f'The template {self.template_file} does not use {stream_key}'
+        head = ''.join(head_chunks)
+        tail = ''.join(tail_chunks)
+
+        output_file_paths = []
+        file = None
+        volume_bytes = 0
+        try:
+            for piece in pieces:
+                if file is None or (max_volume_bytes is not None and volume_bytes >= max_volume_bytes):
+                    if file is not None:
+                        file.write(tail)
+                        file.close()
+                    volume = len(output_file_paths) + 1
+                    output_file_path = self.output_folder / (f'output_{set_index}-{volume}.tex' if max_volume_bytes is not None else f'output_{set_index}.tex')
+                    file = open(output_file_path, 'w')
+                    file.write(head)
+                    output_file_paths.append(output_file_path)
+                    volume_bytes = 0
+                file.write(piece)
+                volume_bytes += len(piece.encode('utf-8'))
+            if file is None:
+                output_file_path = self.output_folder / f'output_{set_index}.tex'
+                file = open(output_file_path, 'w')
+                file.write(head)
+                output_file_paths.append(output_file_path)
+            file.write(tail)
+        finally:
+            if file is not None:
+                file.close()
+        for output_file_path in output_file_paths:
+            print(f'File written to {output_file_path}')
+        return output_file_paths
         
     
     def __render_template(self, output_file_path:Path, **kwargs):
         '''
         Create the rendered template and export it.
         '''
-        template = latex_jinja_env.get_template(str(self.template_file))
-        rendered_template = template.render(**kwargs)
+        rendered_template = self.template.render(**kwargs)
         with open(output_file_path, 'w') as f:
             f.write(rendered_template)
-        print(f'File written to {output_file_path}')
\ No newline at end of file
+        print(f'File written to {output_file_path}')
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+
+templates_folder = Path(__file__).parent / 'resources' / 'Templates'
+
+
+def get_file_hash(file_path) -> str:
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class ExportWorkspace:
+    '''
+    Keeps an export folder in step with the template folder. The static templates are hard linked (or symbolic linked, or copied if links are not
+    possible), and the files that are edited in the export folder, like `Exercise.tex`, are copied. A manifest records the modification time, size
+    and hash of every source file, so only the files that changed are updated, and copies edited in the export folder are never overwritten.
+    A file of an existing export folder that isn't in the manifest is only replaced if it is identical to its template.
+    A hard or symbolic link shares its content with the template, so editing a linked file in place (e.g. `Definition/template.tex`) edits the
+    template in `resources/Templates` too. Files meant to be edited in the export folder belong in `editable_files`.
+
+    Members:
+    template_folder (Path): The folder of the templates.
+    export_folder (Path): The export folder, e.g. `Exports/{date}`.
+    editable_files (set): The names of the files that are always copied since they are edited in the export folder.
+    manifest_path (Path): The json file that records the state of every file of the export folder taken from the templates.
+    '''
+    def __init__(self, export_folder:str, template_folder:str=templates_folder, editable_files:tuple=('Exercise.tex',)):
+        self.template_folder = Path(template_folder)
+        self.export_folder = Path(export_folder)
+        self.editable_files = set(editable_files)
+        self.manifest_path = self.export_folder / '.workspace_manifest.json'
+
+
+    def materialise(self) -> dict:
+        '''
+        Creates or updates the export folder and returns the number of files that were linked, copied, kept and left untouched because they were edited.
+        '''
+        self.export_folder.mkdir(parents=True, exist_ok=True)
+        manifest = self.__read_manifest()
+        counts = {'linked': 0, 'copied': 0, 'unchanged': 0, 'edited': 0}
+        for source in sorted(path for path in self.template_folder.rglob('*') if path.is_file()):
+            key = source.relative_to(self.template_folder).as_posix()
+            destination = self.export_folder / key
+            stat = source.stat()
+            entry = manifest.get(key)
+            if entry is not None and destination.exists() and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                counts['unchanged'] += 1
+                continue
+            source_hash = get_file_hash(source)
+            if entry is not None and destination.exists():
+                if entry['mode'] != 'copy' and os.path.samefile(source, destination):
+                    # The link follows the source
+                    counts['unchanged'] += 1
+                    manifest[key] = dict(entry, mtime=stat.st_mtime_ns, size=stat.st_size, hash=source_hash)
+                    continue
+                destination_hash = get_file_hash(destination)
+                if entry['mode'] == 'copy' and destination_hash == source_hash:
+                    counts['unchanged'] += 1
+                    manifest[key] = dict(entry, mtime=stat.st_mtime_ns, size=stat.st_size)
+                    continue
+                if destination_hash not in (entry['hash'], source_hash):
+                    print(f'{destination} was edited in the export folder and is not updated')
+                    counts['edited'] += 1
+                    continue
+            elif destination.exists():
+                # Not in the manifest, e.g. a folder made by copying the templates: only identical files are replaced
+                if os.path.samefile(source, destination):
+                    counts['unchanged'] += 1
+                    manifest[key] = {'mode': 'symlink' if destination.is_symlink() else 'hardlink', 'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'hash': source_hash}
+                    continue
+                if get_file_hash(destination) != source_hash:
+                    print(f'{destination} differs from the template and is not updated')
+                    counts['edited'] += 1
+                    continue
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            mode = self.__materialise_file(source, destination, copy=source.name in self.editable_files)
+            counts['copied' if mode == 'copy' else 'linked'] += 1
+            manifest[key] = {'mode': mode, 'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'hash': source_hash}
+        self.__write_manifest(manifest)
+        print(f'Export folder {self.export_folder}: ' + ', '.join(f'{count} {state}' for state, count in counts.items()))
+        return counts
+
+
+    def __materialise_file(self, source:Path, destination:Path, copy:bool) -> str:
+        if destination.exists() or destination.is_symlink():
+            destination.unlink()
+        if not copy:
+            try:
+                os.link(source, destination)
+                return 'hardlink'
+            except OSError:
+                pass
+            try:
+                destination.symlink_to(source.resolve())
+                return 'symlink'
+            except OSError:
+                pass
+        shutil.copy2(source, destination)
+        return 'copy'
+
+
+    def __read_manifest(self) -> dict:
+        if not self.manifest_path.exists():
+            return dict()
+        with open(self.manifest_path) as file:
+            return json.load(file)
+
+
+    def __write_manifest(self, manifest:dict) -> None:
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + '.tmp')
+        with open(tmp_path, 'w') as file:
+            json.dump(manifest, file, indent=4)
+        os.replace(tmp_path, self.manifest_path)
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+
+class LatexCompiler:
+    '''
+    Compiles the rendered exercise sheets (`output_*.tex`) of an export folder into pdf files with the local TeX install,
+    running several latexmk or pdflatex processes at the same time.
+    A sheet is skipped if neither it nor the main file `Exercise.tex` has changed since it was last compiled successfully.
+
+    Members:
+    export_folder (Path): The export folder, which contains `Exercise.tex` and a folder for every kind of exercise.
+    max_workers (int): The maximum number of TeX processes running at the same time.
+    timeout (float): The number of seconds after which a TeX process is stopped.
+    command (list): The command that compiles a tex file, without the file name.
+    manifest_path (Path): The json file of the hashes of the sheets that were compiled successfully.
+    timings (dict): The number of seconds spent on every sheet compiled in the last call of `compile`.
+    '''
+    def __init__(self, export_folder:str, max_workers:int=None, timeout:float=300, compiler:str=None):
+        self.export_folder = Path(export_folder)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        compiler = compiler or ('latexmk' if shutil.which('latexmk') else 'pdflatex')
+        assert shutil.which(compiler), f'{compiler} is not installed'
+        if compiler == 'latexmk':
+            self.command = ['latexmk', '-pdf', '-interaction=nonstopmode', '-halt-on-error']
+        else:
+            self.command = [compiler, '-interaction=nonstopmode', '-halt-on-error']
+        self.manifest_path = self.export_folder / '.latex_manifest.json'
+        self.timings = dict()
+
+
+    def compile(self, tex_files:list=None, force:bool=False) -> dict:
+        '''
+        Compiles the sheets `tex_files`, by default every `output_*.tex` in the export folder, and returns the dictionary of the sheets that failed
+        with the end of their log. Unchanged sheets are skipped unless `force` is True.
+        '''
+        if tex_files is None:
+            tex_files = sorted(self.export_folder.glob('*/output_*.tex'))
+        manifest = self.__read_manifest()
+        main_hash = self.__get_hash(self.export_folder / 'Exercise.tex')
+        to_compile = dict()
+        for tex_file in map(Path, tex_files):
+            key = tex_file.resolve().relative_to(self.export_folder.resolve()).as_posix()
+            content_hash = hashlib.sha256((main_hash + self.__get_hash(tex_file)).encode()).hexdigest()
+            if not force and manifest.get(key) == content_hash and tex_file.with_suffix('.pdf').exists():
+                continue
+            to_compile[tex_file] = (key, content_hash)
+        print(f'Compiling {len(to_compile)} of {len(tex_files)} sheets')
+        self.timings = dict()
+        failures = dict()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.__compile_file, tex_file): tex_file for tex_file in to_compile}
+            for future in as_completed(futures):
+                tex_file = futures[future]
+                key, content_hash = to_compile[tex_file]
+                succeeded, seconds, log = future.result()
+                self.timings[key] = seconds
+                if succeeded:
+                    manifest[key] = content_hash
+                    print(f'{key}: {seconds:.1f}s')
+                else:
+                    manifest.pop(key, None)
+                    failures[key] = log
+                    print(f'{key}: failed after {seconds:.1f}s')
+        self.__write_manifest(manifest)
+        print(f'Compiled {len(to_compile) - len(failures)} sheets in {time.perf_counter() - start:.1f}s, {len(failures)} failed')
+        return failures
+
+
+    def __compile_file(self, tex_file:Path):
+        # The sheets refer to ../Exercise.tex, so they are compiled in their own folder
+        start = time.perf_counter()
+        try:
+            result = subprocess.run(self.command + [tex_file.name], cwd=tex_file.parent, capture_output=True,
+                                    stdin=subprocess.DEVNULL, timeout=self.timeout)
+            succeeded = result.returncode == 0
+            log = result.stdout.decode('utf-8', errors='replace')[-2000:]
+        except subprocess.TimeoutExpired:
+            succeeded = False
+            log = f'Timed out after {self.timeout} seconds'
+        return succeeded, time.perf_counter() - start, log
+
+
+    def __get_hash(self, file_path:Path) -> str:
+        if not file_path.exists():
+            return ''
+        with open(file_path, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+
+    def __read_manifest(self) -> dict:
+        if not self.manifest_path.exists():
+            return dict()
+        with open(self.manifest_path) as file:
+            return json.load(file)
+
+
+    def __write_manifest(self, manifest:dict) -> None:
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + '.tmp')
+        with open(tmp_path, 'w') as file:
+            json.dump(manifest, file, indent=4)
+        os.replace(tmp_path, self.manifest_path)
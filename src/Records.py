@@ -0,0 +1,155 @@
+from collections.abc import Mapping
+from types import MappingProxyType
+
+
+class Record(Mapping):
+    '''
+    A read-only record with a slot for every known key, which takes much less memory than a dictionary per entry.
+    It can still be read like the dictionary it was made from (`record['part of speech']`, `get`, `in`, iteration), so the code reading
+    the json entries works with records unchanged. Keys missing from the json are missing from the record, and unknown keys are kept in `extra`.
+    `from_dict` and `to_dict` convert from and to the json entries.
+
+    Members:
+    extra (dict): The unknown keys and their values, or None.
+    '''
+    __slots__ = ('extra',)
+    # The json keys and the names of their slots, in order
+    _keys = {}
+    # The functions that convert the json values of nested entries
+    _converters = {}
+
+    @classmethod
+    def from_dict(cls, data:dict):
+        if isinstance(data, cls):
+            return data
+        record = cls.__new__(cls)
+        extra = None
+        for key, value in data.items():
+            attribute = cls._keys.get(key)
+            if attribute is None:
+                if extra is None:
+                    extra = dict()
+                extra[key] = value
+                continue
+            converter = cls._converters.get(key)
+            object.__setattr__(record, attribute, converter(value) if converter is not None else value)
+        object.__setattr__(record, 'extra', extra)
+        return record
+
+
+    def to_dict(self) -> dict:
+        return {key: _to_json(value) for key, value in self.items()}
+
+
+    def __copy__(self):
+        # Records are read-only, so a copy can share them
+        return self
+
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is read-only')
+
+
+    def __getitem__(self, key:str):
+        attribute = self._keys.get(key)
+        if attribute is None:
+            if self.extra is not None and key in self.extra:
+                return self.extra[key]
+            raise KeyError(key)
+        try:
+            return getattr(self, attribute)
+        except AttributeError:
+            raise KeyError(key) from None
+
+
+    def __iter__(self):
+        for key, attribute in self._keys.items():
+            if hasattr(self, attribute):
+                yield key
+        if self.extra is not None:
+            yield from self.extra
+
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.to_dict()!r})'
+
+
+def _to_json(value):
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    if isinstance(value, Mapping):
+        return {key: _to_json(item) for key, item in value.items()}
+    return value
+
+
+class Example(Record):
+    __slots__ = ('english', 'chinese')
+    _keys = {'English': 'english', 'Chinese': 'chinese'}
+
+
+def _to_example(value):
+    return Example.from_dict(value) if isinstance(value, Mapping) else value
+
+
+class Collocation(Record):
+    __slots__ = ('key', 'example')
+    _keys = {'key': 'key', 'example': 'example'}
+    _converters = {'example': _to_example}
+
+
+class Pattern(Record):
+    __slots__ = ('usage', 'example')
+    _keys = {'usage': 'usage', 'example': 'example'}
+    _converters = {'example': _to_example}
+
+
+class Card(Record):
+    '''
+    A card of a stack (see `paths.json`). The examples and the patterns are tuples, and the collocations are a read-only mapping from categories
+    to tuples of `Collocation`, so the card can be shared instead of copied.
+    '''
+    __slots__ = ('word', 'part_of_speech', 'pronunciation', 'forms', 'definition', 'chinese', 'explanation', 'examples', 'collocations', 'patterns')
+    _keys = {
+        'word': 'word',
+        'part of speech': 'part_of_speech',
+        'British received pronunciation': 'pronunciation',
+        'forms': 'forms',
+        'definition': 'definition',
+        'Chinese': 'chinese',
+        'explanation': 'explanation',
+        'examples': 'examples',
+        'collocations': 'collocations',
+        'patterns': 'patterns'
+    }
+    _converters = {
+        'examples': lambda examples: tuple(_to_example(example) for example in examples),
+        'collocations': lambda collocations: MappingProxyType({category: tuple(Collocation.from_dict(collocation) for collocation in collocations[category])
+                                                               for category in collocations}),
+        'patterns': lambda patterns: tuple(Pattern.from_dict(pattern) for pattern in patterns)
+    }
+
+
+class DefinitionEntry(Record):
+    '''
+    A definition of a `WordEntry`. The examples are a tuple.
+    '''
+    __slots__ = ('part_of_speech', 'conjugation', 'definition', 'usage', 'examples')
+    _keys = {
+        'part of speech': 'part_of_speech',
+        'conjugation': 'conjugation',
+        'definition': 'definition',
+        'usage': 'usage',
+        'examples': 'examples'
+    }
+    _converters = {'examples': tuple}
+
@@ -1,42 +1,301 @@
 import json
+import os
+import sqlite3
+from pathlib import Path
+
+
+class CardStore:
+    '''
+    A store of cards in a SQLite file. Every card is saved as json in its own row, keyed by the card ID,
+    so cards can be read, inserted and replaced without reading or rewriting the whole stack.
+    The store can be used like a read-only dictionary from card IDs to cards. The cards keep the order in which they were inserted.
+
+    Members:
+    self.store_path (Path): The path of the SQLite file.
+    self.connection (sqlite3.Connection): The connection to the SQLite file.
+    '''
+    # SQLite limits the number of parameters of a query
+    _chunk_size = 500
+
+    def __init__(self, store_path:str):
+        self.store_path = Path(store_path)
+        self.connection = sqlite3.connect(self.store_path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS cards (card_id TEXT PRIMARY KEY, position INTEGER NOT NULL, data TEXT NOT NULL)')
+        self.connection.commit()
+
+
+    def get(self, card_id:str, default=None):
+        row = self.connection.execute('SELECT data FROM cards WHERE card_id = ?', (card_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else default
+
+
+    def get_many(self, card_ids:list) -> dict:
+        '''
+        Returns the cards with the given IDs, in the order of `card_ids`. IDs that are not in the store are skipped.
+        '''
+        found = dict()
+        for i in range(0, len(card_ids), self._chunk_size):
+            chunk = card_ids[i:i + self._chunk_size]
+            placeholders = ', '.join('?' * len(chunk))
+            for card_id, data in self.connection.execute(f'SELECT card_id, data FROM cards WHERE card_id IN ({placeholders})', chunk):
+                found[card_id] = json.loads(data)
+        return {card_id: found[card_id] for card_id in card_ids if card_id in found}
+
+
+    def insert_many(self, cards:dict) -> None:
+        '''
+        Inserts new cards in one transaction. Raises an exception if any of them is already in the store.
+        '''
+        position = self.connection.execute('SELECT COALESCE(MAX(position), -1) FROM cards').fetchone()[0]
+        rows = []
+        for card_id, card in cards.items():
+            position += 1
+            rows.append((card_id, position, json.dumps(card, ensure_ascii=False)))
+        with self.connection:
+            self.connection.executemany('INSERT INTO cards (card_id, position, data) VALUES (?, ?, ?)', rows)
+
+
+    def update(self, card_id:str, card:dict) -> None:
+        assert card_id in self, f'The card {card_id} does not exist in the store'
+        with self.connection:
+            self.connection.execute('UPDATE cards SET data = ? WHERE card_id = ?', (json.dumps(card, ensure_ascii=False), card_id))
+
+
+    def __getitem__(self, card_id:str):
+        card = self.get(card_id)
+        if card is None:
+            raise KeyError(card_id)
+        return card
+
+
+    def __contains__(self, card_id:str) -> bool:
+        return self.connection.execute('SELECT 1 FROM cards WHERE card_id = ?', (card_id,)).fetchone() is not None
+
+
+    def __len__(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM cards').fetchone()[0]
+
+
+    def __iter__(self):
+        return iter(self.keys())
+
+
+    def keys(self) -> list:
+        return [row[0] for row in self.connection.execute('SELECT card_id FROM cards ORDER BY position')]
+
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def migrate_json_to_store(cards_path:str, store_path:str) -> CardStore:
+    '''
+    Copies the cards of the json file `cards_path` (see `paths.json`) into a new card store at `store_path`.
+    The store is built next to it first and only moved into place once all the cards are in, so a failed migration leaves no store behind.
+    '''
+    assert not Path(store_path).exists(), f'The card store {store_path} already exists'
+    with open(cards_path) as file:
+        cards = json.load(file)
+    tmp_path = Path(store_path).with_name(Path(store_path).name + '.tmp')
+    if tmp_path.exists():
+        tmp_path.unlink()
+    store = CardStore(tmp_path)
+    try:
+        store.insert_many(cards)
+    finally:
+        store.close()
+    os.replace(tmp_path, store_path)
+    print(f'Migrated {len(cards)} cards from {cards_path} to {store_path}')
+    return CardStore(store_path)
+
+
+def open_card_store(cards_path:str, store_path:str) -> CardStore:
+    '''
+    Opens the card store at `store_path`. If it doesn't exist yet, it is created from the json file `cards_path` first.
+    Once the store exists, the json file is no longer read, so a warning is printed if it has been changed since.
+    '''
+    if not Path(store_path).exists():
+        return migrate_json_to_store(cards_path=cards_path, store_path=store_path)
+    if Path(cards_path).exists() and os.path.getmtime(cards_path) > os.path.getmtime(store_path):
+        print(f'Warning: {cards_path} is newer than the card store {store_path}, whose cards are used. Import the new cards with `Stack.import_cards`.')
+    return CardStore(store_path)
+
+
+class ScheduleStore:
+    '''
+    The schedule of a stack (see `Configurator`), kept in the SQLite file of its card store. Every scheduled card has a row with its place among the learned
+    or the unlearned words and its review state, and the other values of the schedule (e.g. `timestamp`) are saved as json in a table of their own,
+    so a step of the schedule only writes the rows it changes instead of rewriting the whole schedule.
+    `load` returns the schedule in the layout of the json file.
+
+    Members:
+    self.store_path (Path): The path of the SQLite file.
+    self.connection (sqlite3.Connection): The connection to the SQLite file.
+    '''
+    # The keys of the json schedule that are saved in the rows of the cards
+    _card_keys = ('learned', 'unlearned', 'reviews')
+
+    def __init__(self, store_path:str):
+        self.store_path = Path(store_path)
+        self.connection = sqlite3.connect(self.store_path)
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS schedule (card_id TEXT PRIMARY KEY, learned INTEGER NOT NULL, position INTEGER NOT NULL,
+                                                 due TEXT, interval INTEGER, ease REAL, repetitions INTEGER);
+            CREATE INDEX IF NOT EXISTS schedule_order ON schedule (learned, position);
+            CREATE TABLE IF NOT EXISTS schedule_state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        ''')
+        self.connection.commit()
+
+
+    def is_empty(self) -> bool:
+        return (self.connection.execute('SELECT 1 FROM schedule LIMIT 1').fetchone() is None and
+                self.connection.execute('SELECT 1 FROM schedule_state LIMIT 1').fetchone() is None)
+
+
+    def load(self) -> dict:
+        schedule = {key: json.loads(value) for key, value in self.connection.execute('SELECT key, value FROM schedule_state')}
+        schedule['learned'] = []
+        schedule['unlearned'] = []
+        schedule['reviews'] = dict()
+        for card_id, learned, due, interval, ease, repetitions in self.connection.execute(
+                'SELECT card_id, learned, due, interval, ease, repetitions FROM schedule ORDER BY learned, position'):
+            schedule['learned' if learned else 'unlearned'].append(card_id)
+            if due is not None:
+                schedule['reviews'][card_id] = {'due': due, 'interval': interval, 'ease': ease, 'repetitions': repetitions}
+        return schedule
+
+
+    def replace(self, schedule:dict) -> None:
+        '''
+        Replaces the whole schedule with `schedule`, in the layout of the json file, in one transaction.
+        '''
+        reviews = schedule.get('reviews', dict())
+        rows = []
+        for learned, key in [(1, 'learned'), (0, 'unlearned')]:
+            for position, card_id in enumerate(schedule[key]):
+                review = reviews.get(card_id) if learned else None
+                rows.append((card_id, learned, position) + self.__get_review_values(review))
+        with self.connection:
+            self.connection.execute('DELETE FROM schedule')
+            self.connection.execute('DELETE FROM schedule_state')
+            self.connection.executemany('INSERT INTO schedule VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            self.__set_state(schedule)
+
+
+    def update(self, state:dict, learned:list=(), unlearned_front:list=(), reviews:dict=None) -> None:
+        '''
+        Writes one step of the schedule in one transaction: the cards `learned` are moved to the end of the learned words, the cards `unlearned_front`
+        are moved back to the front of the unlearned words, in their order, and the review states `reviews` are saved. The values of `state` replace
+        the other values of the schedule.
+        '''
+        with self.connection:
+            if learned:
+                position = self.connection.execute('SELECT COALESCE(MAX(position), -1) FROM schedule WHERE learned = 1').fetchone()[0] + 1
+                self.connection.executemany('UPDATE schedule SET learned = 1, position = ? WHERE card_id = ?',
+                                            [(position + i, card_id) for i, card_id in enumerate(learned)])
+            if unlearned_front:
+                position = self.connection.execute('SELECT COALESCE(MIN(position), 0) FROM schedule WHERE learned = 0').fetchone()[0] - len(unlearned_front)
+                self.connection.executemany('UPDATE schedule SET learned = 0, position = ?, due = NULL, interval = NULL, ease = NULL, repetitions = NULL WHERE card_id = ?',
+                                            [(position + i, card_id) for i, card_id in enumerate(unlearned_front)])
+            if reviews:
+                self.connection.executemany('UPDATE schedule SET due = ?, interval = ?, ease = ?, repetitions = ? WHERE card_id = ?',
+                                            [self.__get_review_values(review) + (card_id,) for card_id, review in reviews.items()])
+            self.__set_state(state)
+
+
+    def append_unlearned(self, card_ids:list) -> None:
+        '''
+        Adds new cards at the end of the unlearned words, in one transaction.
+        '''
+        with self.connection:
+            position = self.connection.execute('SELECT COALESCE(MAX(position), -1) FROM schedule WHERE learned = 0').fetchone()[0] + 1
+            self.connection.executemany('INSERT INTO schedule (card_id, learned, position) VALUES (?, 0, ?)',
+                                        [(card_id, position + i) for i, card_id in enumerate(card_ids)])
+
+
+    def __contains__(self, card_id:str) -> bool:
+        return self.connection.execute('SELECT 1 FROM schedule WHERE card_id = ?', (card_id,)).fetchone() is not None
+
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+    def __set_state(self, schedule:dict) -> None:
+        self.connection.executemany('INSERT OR REPLACE INTO schedule_state (key, value) VALUES (?, ?)',
+                                    [(key, json.dumps(value, ensure_ascii=False)) for key, value in schedule.items() if key not in self._card_keys])
+
+
+    def __get_review_values(self, review:dict) -> tuple:
+        if review is None:
+            return (None, None, None, None)
+        return (review['due'], review['interval'], review['ease'], review['repetitions'])
+
+
+def open_schedule_store(schedule_path:str, store_path:str) -> ScheduleStore:
+    '''
+    Opens the schedule in the card store at `store_path`, which must exist (see `open_card_store`). If the store has no schedule yet,
+    the json file `schedule_path` is copied into it first. Once it has one, the json file is no longer read, so a warning is printed if it has been changed since.
+    '''
+    assert Path(store_path).exists(), f'The card store {store_path} does not exist. Open it with `open_card_store` first.'
+    store = ScheduleStore(store_path)
+    if store.is_empty():
+        with open(schedule_path) as file:
+            schedule = json.load(file)
+        store.replace(schedule)
+        print(f'Migrated the schedule of {len(schedule["learned"]) + len(schedule["unlearned"])} cards from {schedule_path} to {store_path}')
+    elif Path(schedule_path).exists() and os.path.getmtime(schedule_path) > os.path.getmtime(store_path):
+        print(f'Warning: {schedule_path} is newer than the card store {store_path}, whose schedule is used.')
+    return store
 
 
 class Stack:
-    def __init__(self, schedule_path:str, cards_path:str):
+    def __init__(self, schedule_path:str, cards_path:str, store_path:str=None):
+        '''
+        Constructor.
+
+        Members:
+        self.schedule (dict or ScheduleStore): The schedule. If `store_path` is given, it is kept in the card store (migrated from `schedule_path` if needed). Otherwise it is imported from the json file `schedule_path`.
+        self.cards (dict or CardStore): The cards. If `store_path` is given, they are kept in the card store there (migrated from `cards_path` if needed). Otherwise they are imported from the json file `cards_path`.
+        '''
         self.schedule_path = schedule_path
         self.cards_path = cards_path
-        with open(schedule_path) as file:
-            self.schedule = json.load(file)
-        with open(cards_path) as file:
-            self.cards = json.load(file)
-    
-    
+        self.store_path = store_path
+        if store_path is not None:
+            self.cards = open_card_store(cards_path=cards_path, store_path=store_path)
+            self.schedule = open_schedule_store(schedule_path=schedule_path, store_path=store_path)
+        else:
+            with open(schedule_path) as file:
+                self.schedule = json.load(file)
+            with open(cards_path) as file:
+                self.cards = json.load(file)
+
+
     def import_cards(self, json_path:str):
         '''
         Import the cards from the JSON file and update the cards in the stack
         '''
         with open(json_path) as file:
             new_cards = json.load(file)
-        
+
         # Check if every card in new_cards is not in self.cards and not in the schedule
         assert all([card_id not in self.cards for card_id in new_cards]), 'Some cards already exist in the stack'
-        assert all([card_id not in self.schedule['learned'] and card_id not in self.schedule['unlearned'] for card_id in new_cards]), 'Some cards already exist in the schedule'
-
-        # Update the cards in the stack
-        self.cards.update(new_cards)
-
-        # Update the schedule
-        self.schedule['unlearned'].extend(new_cards.keys())
-
-        # Write the updated cards and schedule back to the JSON file
-        with open(self.cards_path, 'w') as file:
-            json.dump(self.cards, file, indent=4, ensure_ascii=False)
-
-        with open(self.schedule_path, 'w') as file:
-            json.dump(self.schedule, file, indent=4, ensure_ascii=False)
-
-        print('==== Import successful ====')
-
+        if isinstance(self.schedule, ScheduleStore):
+            assert all([card_id not in self.schedule for card_id in new_cards]), 'Some cards already exist in the schedule'
+        else:
+            scheduled_cards = set(self.schedule['learned']) | set(self.schedule['unlearned'])
+            assert all([card_id not in scheduled_cards for card_id in new_cards]), 'Some cards already exist in the schedule'
 
+        # Update the cards and the schedule. The store only inserts the new rows.
+        if isinstance(self.cards, CardStore):
+            self.cards.insert_many(new_cards)
+            self.schedule.append_unlearned(list(new_cards))
+        else:
+            self.cards.update(new_cards)
+            with open(self.cards_path, 'w') as file:
+                json.dump(self.cards, file, indent=4, ensure_ascii=False)
+            self.schedule['unlearned'].extend(new_cards.keys())
+            with open(self.schedule_path, 'w') as file:
+                json.dump(self.schedule, file, indent=4, ensure_ascii=False)
 
-    
+        print('==== Import successful ====')
\ No newline at end of file
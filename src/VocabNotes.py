@@ -1,20 +1,43 @@
+from utils import string_processing_for_latex, TextBuffer
+
+
 class VocabNotes:
-    def __init__(self, word_entries:dict):
+    def __init__(self, word_entries:dict, streaming:bool=False):
+        '''
+        Constructor.
+
+        Members:
+        self.word_entries (dict): The word entries, from words to lists of notes.
+        self.streaming (bool): If True, the notes are not written in advance. `get_outputs` returns a generator of the `\\Vocabulary` blocks instead,
+            which `ExerciseWriter.render_template_streaming` (also used by `render_template` for streaming notes) writes to disk one by one,
+            so a whole stack can be rendered in bounded memory.
+        self.notes_dict (dict): The outputs for the template.
+        '''
         self.word_entries = word_entries
+        self.streaming = streaming
         keys = ['notes']
         self.notes_dict = dict.fromkeys(keys)
-        self.write_notes()
+        if not streaming:
+            self.write_notes()
 
 
     def get_outputs(self):
+        if self.streaming:
+            return {'notes': self.iter_notes()}
         return self.notes_dict
 
 
     def write_notes(self):
-        entries = self._format_notes(self.word_entries)
-        def_text = ''
-        for entry in entries:
+        self.notes_dict['notes'] = TextBuffer(*self.iter_notes())
+
+
+    def iter_notes(self):
+        '''
+        Yields the `\\Vocabulary` block of every note.
+        '''
+        for entry in self._format_notes(self.word_entries):
             for note in entry:
+                def_text = TextBuffer()
                 word = note['word']
                 part_of_speech = note['part of speech']
                 definition = note['definition']
@@ -47,52 +70,16 @@ class VocabNotes:
                 for item in items_1:
                     def_text += '\\item ' + self._string_processing(item[0]) + '\n\n' + item[1] + '\n'
                 def_text += '}'
-        self.notes_dict['notes'] = def_text
+                yield str(def_text)
 
 
     def _string_processing(self, text):
         '''
         Parse strings
         '''
-        text = self.__unify_quotes(text)
-        text = self.__replace_en_dashes(text)
-        text = self.__replace_quotes(text)
-        text = self.__replace_pounds(text)
-        return text
-    
-
-    def __unify_quotes(self, text):
-        text = text.replace("’", "'")
-        text = text.replace("‘", "'")
-        text = text.replace("“", '"')
-        text = text.replace("”", '"')
-        return text
-                            
-
-    def __replace_quotes(self, text):
-        text_list = text.split(' ')
-        text_list_new = []
-        for word in text_list:
-            if word.startswith("'"):
-                word = '`' + word[1:]
-            if word.startswith('"'):
-                word = '``' + word[1:]
-            if word.endswith('"'):
-                word = word[:-1] + "''"
-            text_list_new.append(word)
-        return ' '.join(text_list_new)
-
-
-    def __replace_pounds(self, text):
-        return text.replace('£', r'\pounds')
-
-
-    def __replace_en_dashes(self, text):
-        return text.replace('–', '--')
+        return string_processing_for_latex(text)
 
 
     def _format_notes(self, word_entries:dict):
-        notes = []
-        for _, entry in word_entries.items():
-            notes.append(entry)
-        return notes
\ No newline at end of file
+        for entry in word_entries.values():
+            yield entry
\ No newline at end of file
@@ -1,42 +1,202 @@
 import json
+import os
 from pathlib import Path
-from copy import deepcopy
+from types import MappingProxyType
 import requests
 from numpy import random
 import csv
 import re
-from datetime import date
+import heapq
+import math
+import time
+from collections import deque
+from itertools import islice, count
+from datetime import date, datetime, timedelta
 from abc import ABC, abstractmethod
+from AnkiPackage import AnkiPackageWriter
+from utils import TextBuffer
+from Records import Card
+from Stack import open_schedule_store
+
+
+class WordQueue:
+    '''
+    An ordered collection of unique words with a set index.
+    Membership tests are O(1), and taking words from or putting words back at the front costs O(1) per word.
+    '''
+    def __init__(self, words:list=()):
+        self.__words = deque()
+        self.__index = set()
+        self.extend(words)
+
+
+    def peek(self, n:int) -> list:
+        return list(islice(self.__words, n))
+
+
+    def popleft(self, n:int) -> list:
+        words = [self.__words.popleft() for _ in range(min(n, len(self.__words)))]
+        self.__index.difference_update(words)
+        return words
+
+
+    def extendleft(self, words:list) -> None:
+        '''
+        Puts the words back at the front, keeping their order. Words that are already in the queue are skipped.
+        '''
+        for word in reversed(words):
+            if word not in self.__index:
+                self.__words.appendleft(word)
+                self.__index.add(word)
+
+
+    def extend(self, words:list) -> None:
+        for word in words:
+            if word not in self.__index:
+                self.__words.append(word)
+                self.__index.add(word)
+
+
+    def __contains__(self, word:str) -> bool:
+        return word in self.__index
+
+
+    def __len__(self) -> int:
+        return len(self.__words)
+
+
+    def __iter__(self):
+        return iter(self.__words)
+
+
+class DueQueue:
+    '''
+    A priority queue of card IDs ordered by due date, with an index from every card ID to its heap entry and from every day to the cards due on it.
+    Rescheduling a card marks its old heap entry as stale instead of searching for it, so pushing and removing a card are O(log N).
+    '''
+    def __init__(self):
+        self.__heap = [] # Entries [day ordinal, insertion counter, card ID]. The card ID of a stale entry is None.
+        self.__entries = dict()
+        self.__cards_by_day = dict()
+        self.__counter = count()
+
+
+    def push(self, card_id:str, due:date) -> None:
+        '''
+        Schedules the card on the day `due`, replacing its previous due date if it has one.
+        '''
+        self.remove(card_id)
+        entry = [due.toordinal(), next(self.__counter), card_id]
+        self.__entries[card_id] = entry
+        self.__cards_by_day.setdefault(entry[0], set()).add(card_id)
+        heapq.heappush(self.__heap, entry)
+
+
+    def remove(self, card_id:str) -> None:
+        entry = self.__entries.pop(card_id, None)
+        if entry is None:
+            return
+        self.__cards_by_day[entry[0]].discard(card_id)
+        entry[2] = None
+        # Rebuild the heap once most of it is stale
+        if len(self.__heap) > 2 * len(self.__entries) + 16:
+            self.__heap = [entry for entry in self.__heap if entry[2] is not None]
+            heapq.heapify(self.__heap)
+
+
+    def due_on(self, day:date) -> list:
+        return sorted(self.__cards_by_day.get(day.toordinal(), ()))
+
+
+    def next_due(self, n:int) -> list:
+        '''
+        Returns up to n tuples (card ID, due date) of the cards due soonest.
+        '''
+        return self.__pop_while(lambda entry, popped: len(popped) < n)
+
+
+    def due_by(self, day:date) -> list:
+        '''
+        Returns the tuples (card ID, due date) of the cards due on or before `day`, soonest first.
+        '''
+        return self.__pop_while(lambda entry, popped: entry[0] <= day.toordinal())
+
+
+    def __pop_while(self, condition) -> list:
+        popped = []
+        while self.__heap and condition(self.__heap[0], popped):
+            entry = heapq.heappop(self.__heap)
+            if entry[2] is not None:
+                popped.append(entry)
+        for entry in popped:
+            heapq.heappush(self.__heap, entry)
+        return [(entry[2], date.fromordinal(entry[0])) for entry in popped]
+
+
+    def __contains__(self, card_id:str) -> bool:
+        return card_id in self.__entries
+
+
+    def __len__(self) -> int:
+        return len(self.__entries)
 
 
 class Configurator:
     '''
     A class that manipulates the configuration json file.
+    If `store_path` is given, the schedule is kept in the card store there instead (see `ScheduleStore`), where every step only writes the rows of the cards it changes.
+    The json file is then only read once, to migrate the schedule into the store.
     Members:
     json_path: The path of the json file.
+    store(ScheduleStore): The schedule in the card store, or None if the schedule is saved in the json file.
     config(dict): The data saved in the config json file.
+    learned(dict): The learned words in order. Only the keys are used, as an ordered set.
+    unlearned(WordQueue): The words to learn in order.
+    reviews(dict): The SM-2 review state of every learned card: its due date, interval in days, ease factor and number of successful repetitions. It is saved under `reviews` in the json file.
+        Learned cards without a state (e.g. learned before the reviews were recorded) get a default one, due on the day the file is loaded.
+    due_queue(DueQueue): The learned cards ordered by due date.
     '''
-    def __init__(self, json_path:str):
+    def __init__(self, json_path:str, store_path:str=None):
         self.json_path = Path(json_path)
-        assert Path.exists(self.json_path), 'The scheduler json file does not exist'
-        with open(self.json_path) as file:
-            self.config = json.load(file)
+        self.store = open_schedule_store(schedule_path=json_path, store_path=store_path) if store_path is not None else None
+        if self.store is not None:
+            self.config = self.store.load()
+        else:
+            assert Path.exists(self.json_path), 'The scheduler json file does not exist'
+            with open(self.json_path) as file:
+                self.config = json.load(file)
+        self.learned = dict.fromkeys(self.config['learned'])
+        self.unlearned = WordQueue(self.config['unlearned'])
+        self.reviews = self.config.get('reviews', dict())
+        self.due_queue = DueQueue()
+        for card_id, review in self.reviews.items():
+            self.due_queue.push(card_id, date.fromisoformat(review['due']))
+        # The cards learned before the reviews were recorded start with a default state, due today
+        unreviewed = [card_id for card_id in self.learned if card_id not in self.reviews]
+        for card_id in unreviewed:
+            self.__schedule(card_id, due=date.today(), interval=1, ease=2.5, repetitions=0)
+        if unreviewed:
+            print(f'{len(unreviewed)} learned words had no review state and are due today')
+            if self.store is not None:
+                self.__export(reviewed=unreviewed)
 
 
     def reset(self):
         '''
         The method set the `review` list to an empty list and set the `new` list to the whole list.
         '''
-        self.config['unlearned'] = (self.config['learned'] + self.config['unlearned']).sort()
-        self.config['learned'] = []
+        self.unlearned = WordQueue(sorted(list(self.learned) + list(self.unlearned)))
+        self.learned = dict()
+        self.reviews = dict()
+        self.due_queue = DueQueue()
         self.config['last learned'] = []
         self.config['last timestamp'] = '2000-01-01'
         self.config['timestamp'] = '2000-01-01'
-        self.__export()
+        self.__export(everything=True)
 
     
     def get_n_words_to_learn(self, n:int):
-        list_to_return = self.config['unlearned'][:n]
+        list_to_return = self.unlearned.peek(n)
         if len(list_to_return) < n:
             print(f'Only {len(list_to_return)} words left to learn')
         return list_to_return
@@ -44,133 +204,428 @@ class Configurator:
 
     def revert_last_study(self):
         self.config['timestamp'] = self.config['last timestamp']
-        self.config['unlearned'] = self.config['last learned'] + self.config['unlearned']
-        self.config['learned'] = [word for word in self.config['learned'] if word not in self.config['last learned']]
-        self.__export()
+        for word in self.config['last learned']:
+            self.learned.pop(word, None)
+            self.reviews.pop(word, None)
+            self.due_queue.remove(word)
+        self.unlearned.extendleft(self.config['last learned'])
+        self.__export(unlearned_front=self.config['last learned'])
 
     
 
     def study_n_words(self, n:int):
-        new_list = self.config['unlearned']
-        review_list = self.config['learned']
-        new_word_list = self.get_n_words_to_learn(n)
-        review_list += new_word_list
-        new_list = [word for word in new_list if word not in new_word_list]
-        self.config['learned'] = deepcopy(review_list)
-        self.config['unlearned'] = deepcopy(new_list)
-        self.config['last learned'] = new_word_list
         assert self.config['timestamp'] != str(date.today()), 'You have already studied today.'
+        if len(self.unlearned) < n:
+            print(f'Only {len(self.unlearned)} words left to learn')
+        new_word_list = self.unlearned.popleft(n)
+        self.learned.update(dict.fromkeys(new_word_list))
+        # The words learned today are reviewed for the first time tomorrow
+        tomorrow = date.today() + timedelta(days=1)
+        for word in new_word_list:
+            self.__schedule(word, due=tomorrow, interval=1, ease=2.5, repetitions=0)
+        self.config['last learned'] = new_word_list
         self.config['last timestamp'] = self.config['timestamp']
         self.config['timestamp'] = str(date.today())
-        self.__export()
+        self.__export(learned=new_word_list, reviewed=new_word_list)
+
+
+    def review(self, card_id:str, quality:int, day:date=None):
+        '''
+        Records a review of a learned card and schedules its next review with the SM-2 algorithm.
+
+        Args:
+            card_id (str): The ID of the card.
+            quality (int): The quality of the answer, from 0 (complete blackout) to 5 (perfect response).
+            day (date, optional): The day of the review. Defaults to today.
+        '''
+        assert card_id in self.reviews, f'The card {card_id} has not been learned yet'
+        assert 0 <= quality <= 5, 'The quality must be between 0 and 5'
+        day = day if day is not None else date.today()
+        review = self.reviews[card_id]
+        interval, ease, repetitions = review['interval'], review['ease'], review['repetitions']
+        if quality >= 3:
+            if repetitions == 0:
+                interval = 1
+            elif repetitions == 1:
+                interval = 6
+            else:
+                interval = round(interval * ease)
+            repetitions += 1
+        else:
+            repetitions = 0
+            interval = 1
+        ease = max(1.3, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        self.__schedule(card_id, due=day + timedelta(days=interval), interval=interval, ease=ease, repetitions=repetitions)
+        self.__export(reviewed=[card_id])
+
+
+    def get_words_due_on(self, day:date) -> list:
+        return self.due_queue.due_on(day)
+
 
+    def get_words_due_by(self, day:date) -> list:
+        return [card_id for card_id, _ in self.due_queue.due_by(day)]
 
-    def __export(self):
+
+    def get_next_n_due_words(self, n:int) -> list:
+        return [card_id for card_id, _ in self.due_queue.next_due(n)]
+
+
+    def __schedule(self, card_id:str, due:date, interval:int, ease:float, repetitions:int):
+        self.reviews[card_id] = {'due': str(due), 'interval': interval, 'ease': ease, 'repetitions': repetitions}
+        self.due_queue.push(card_id, due)
+
+
+    def __export(self, learned:list=(), unlearned_front:list=(), reviewed:list=(), everything:bool=False):
+        '''
+        Saves the schedule. The json file is always rewritten, while the store only writes the cards `learned`, `unlearned_front` (put back at the front of
+        the unlearned words) and `reviewed`, unless `everything` is True.
+        '''
+        if self.store is not None:
+            if everything:
+                self.store.replace(dict(self.config, learned=list(self.learned), unlearned=list(self.unlearned), reviews=self.reviews))
+            else:
+                state = {key: value for key, value in self.config.items() if key not in ('learned', 'unlearned', 'reviews')}
+                self.store.update(state, learned=learned, unlearned_front=unlearned_front,
+                                  reviews={card_id: self.reviews[card_id] for card_id in reviewed if card_id in self.reviews})
+            return
+        self.config['learned'] = list(self.learned)
+        self.config['unlearned'] = list(self.unlearned)
+        self.config['reviews'] = self.reviews
         with open(self.json_path, 'w') as file:
             json.dump(self.config, file, indent=4, ensure_ascii=False)
 
 
+class AnkiCardCache:
+    '''
+    A local mirror of the state of the Anki cards, saved in a json file and kept up to date by `AnkiCommunicator`.
+
+    Members:
+    cache_path (Path): The path of the json file.
+    cards (dict): For every Anki card ID (as a string), its deck, raw `due` value, interval, queue and the card ID extracted from its Back field.
+    decks (dict): For every mirrored deck, the time of its last sync in seconds since the epoch.
+    day_number (int): Anki's number of the day on which the cache was last synced, to which the `due` values of review cards are relative.
+    day_number_date (str): The date of that day.
+    rollover_hour (int): The hour at which Anki starts the next day (4 am by default, see the Review preferences of Anki).
+    '''
+    def __init__(self, cache_path:str, rollover_hour:int=4):
+        self.cache_path = Path(cache_path)
+        self.rollover_hour = rollover_hour
+        data = dict()
+        if self.cache_path.exists():
+            with open(self.cache_path) as file:
+                data = json.load(file)
+        self.cards = data.get('cards', dict())
+        self.decks = data.get('decks', dict())
+        self.day_number = data.get('day number')
+        self.day_number_date = data.get('day number date')
+
+
+    def update(self, cards_info:list, card_ids:list) -> None:
+        '''
+        Stores the state of the cards returned by `cardsInfo`, together with the card IDs extracted from their Back fields.
+        '''
+        for card, card_id in zip(cards_info, card_ids):
+            self.cards[str(card['cardId'])] = {
+                'deck': card['deckName'],
+                'due': card['due'],
+                'interval': card['interval'],
+                'queue': card['queue'],
+                'card_id': card_id
+            }
+
+
+    def remove_missing(self, deck_name:str, anki_card_ids:list) -> None:
+        '''
+        Drops the cards of the deck that are no longer in Anki.
+        '''
+        existing = {str(anki_card_id) for anki_card_id in anki_card_ids}
+        for anki_card_id in [anki_card_id for anki_card_id, card in self.cards.items() if card['deck'] == deck_name and anki_card_id not in existing]:
+            del self.cards[anki_card_id]
+
+
+    def get_card_ids(self, deck_name:str) -> set:
+        '''
+        Returns the Anki card IDs (as strings) of the cards of the deck in the mirror.
+        '''
+        return {anki_card_id for anki_card_id, card in self.cards.items() if card['deck'] == deck_name}
+
+
+    def get_anki_date(self) -> date:
+        '''
+        Returns the date of Anki's today, which only starts at the rollover hour.
+        '''
+        return (datetime.now() - timedelta(hours=self.rollover_hour)).date()
+
+
+    def get_today(self):
+        '''
+        Returns Anki's number of today, or None if it has never been found.
+        '''
+        if self.day_number is None:
+            return None
+        return self.day_number + (self.get_anki_date() - date.fromisoformat(self.day_number_date)).days
+
+
+    def get_words_due_in_n_days(self, deck_name:str, n:int) -> list:
+        today = self.get_today()
+        # Review (2) and day-learning (3) cards are due on a day number
+        return [card['card_id'] for card in self.cards.values() if card['deck'] == deck_name and card['queue'] in (2, 3) and card['due'] == today + n]
+
+
+    def get_words_due_today(self, deck_name:str) -> list:
+        today = self.get_today()
+        now = time.time()
+        # Learning (1) cards are due at a time in seconds since the epoch
+        return [card['card_id'] for card in self.cards.values() if card['deck'] == deck_name and
+                ((card['queue'] in (2, 3) and card['due'] <= today) or (card['queue'] == 1 and card['due'] <= now))]
+
+
+    def save(self) -> None:
+        tmp_path = self.cache_path.with_name(self.cache_path.name + '.tmp')
+        with open(tmp_path, 'w') as file:
+            json.dump({'cards': self.cards, 'decks': self.decks, 'day number': self.day_number, 'day number date': self.day_number_date}, file, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+
 class AnkiCommunicator:
-    def __init__(self):
-        self.base_url = 'http://localhost:8765'
+    '''
+    A client of AnkiConnect. The connection is kept alive in a `requests.Session`,
+    and the methods ending in `_in_decks` query several decks at once with the `multi` action.
+
+    Members:
+    base_url (str): The url of AnkiConnect.
+    response_sizes (list): The tuples (action, number of bytes) of every response received, to keep an eye on the amount of data fetched.
+    cache (AnkiCardCache): If `cache_path` is given, the due cards are looked up in this local mirror, which only fetches the cards changed since its last sync.
+    min_sync_interval (float): The number of seconds during which the mirror of a deck is used without syncing it again.
+    The hour at which Anki starts the next day, `rollover_hour`, is passed to the mirror.
+    '''
+    # Anki only searches the reviews of the last 365 days
+    _max_delta_days = 365
+
+    def __init__(self, base_url:str='http://localhost:8765', cache_path:str=None, min_sync_interval:float=60, rollover_hour:int=4):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.session.headers.update({'Content-Type': 'application/json'})
+        self.response_sizes = []
+        self.cache = AnkiCardCache(cache_path, rollover_hour=rollover_hour) if cache_path is not None else None
+        self.min_sync_interval = min_sync_interval
 
 
     def get_words_in_n_days(self, n, deck_name) -> list:
-        card_ids = self.__get_cards_id_in_n_days(n)
-        if not card_ids:
-            return []
-        cards_info = self.__invoke('cardsInfo', {'cards': card_ids})
-        result_list = [self._extract_card_id_from_field(card['fields']['Back']['value']) for card in cards_info if card and card['deckName'] == deck_name]
-        return result_list
+        return self.get_words_in_n_days_in_decks(n, [deck_name])[deck_name]
 
     
     def get_words_for_today(self, deck_name) -> list:
-        query = f'deck:"{deck_name}" is:due'
-        card_ids = self.__invoke('findCards', {'query': query})
-        if not card_ids:
-            return []
-        cards_info = self.__invoke('cardsInfo', {'cards': card_ids})
-        result_list = [self._extract_card_id_from_field(card['fields']['Back']['value']) for card in cards_info if card and card['deckName'] == deck_name]
-        return result_list
+        return self.get_words_for_today_in_decks([deck_name])[deck_name]
 
 
     def get_words_for_tomorrow(self, deck_name) -> list:
-        query = 'prop:due=1'
-        card_ids = self.__invoke('findCards', {'query': query})
-        if not card_ids:
-            return []
-        cards_info = self.__invoke('cardsInfo', {'cards': card_ids})
-        result_list = [self._extract_card_id_from_field(card['fields']['Back']['value']) for card in cards_info if card and card['deckName'] == deck_name]
-        return result_list
+        return self.get_words_for_tomorrow_in_decks([deck_name])[deck_name]
+
+
+    def get_words_for_today_in_decks(self, deck_names:list) -> dict:
+        if self.__sync_cache(deck_names):
+            return {deck_name: self.cache.get_words_due_today(deck_name) for deck_name in deck_names}
+        return self.__get_words_in_decks(deck_names, 'is:due')
+
+
+    def get_words_for_tomorrow_in_decks(self, deck_names:list) -> dict:
+        return self.get_words_in_n_days_in_decks(1, deck_names)
+
+
+    def get_words_in_n_days_in_decks(self, n:int, deck_names:list) -> dict:
+        if self.__sync_cache(deck_names):
+            return {deck_name: self.cache.get_words_due_in_n_days(deck_name, n) for deck_name in deck_names}
+        return self.__get_words_in_decks(deck_names, f'prop:due={n}')
+
+
+    def sync_cache(self, deck_names:list) -> None:
+        '''
+        Fetches the state of every card of the decks into the local mirror now, e.g. after rescheduling cards by hand.
+        '''
+        assert self.cache is not None, 'The communicator has no cache'
+        self.__sync_cache(deck_names, full=True)
 
 
     def _extract_card_id_from_field(self, input_string):
         matches = re.findall(r'<i>(.*?)</i>', input_string)
         assert matches, 'No word found in the card'
         return matches[0]
+
+
+    def _get_deck_query(self, deck_name:str) -> str:
+        '''
+        Returns the search that matches the cards of the deck itself, excluding its subdecks.
+        '''
+        return f'deck:"{deck_name}" -deck:"{deck_name}::*"'
+
+
+    def __get_words_in_decks(self, deck_names:list, condition:str) -> dict:
+        '''
+        Returns the card IDs of the cards matching `condition` in every deck, in two round trips whatever the number of decks.
+        The Back fields are read with `notesInfo`, whose response is much smaller than that of `cardsInfo`:
+        it carries neither the rendered question and answer nor the CSS of the note type.
+        '''
+        note_id_lists = self.__invoke_multi([('findNotes', {'query': f'{self._get_deck_query(deck_name)} {condition}'}) for deck_name in deck_names])
+        decks_with_notes = [(deck_name, note_ids) for deck_name, note_ids in zip(deck_names, note_id_lists) if note_ids]
+        notes_info_lists = self.__invoke_multi([('notesInfo', {'notes': note_ids}) for _, note_ids in decks_with_notes])
+        result_dict = {deck_name: [] for deck_name in deck_names}
+        for (deck_name, _), notes_info in zip(decks_with_notes, notes_info_lists):
+            result_dict[deck_name] = [self._extract_card_id_from_field(note['fields']['Back']['value']) for note in notes_info if note]
+        return result_dict
     
 
+    def __sync_cache(self, deck_names:list, full:bool=False) -> bool:
+        '''
+        Brings the local mirror of the decks up to date and returns True if the due cards can be read from it.
+        Only the cards of notes edited, cards reviewed or cards added since the last sync and the cards missing from the mirror are fetched, plus the IDs of all cards of the decks to drop deleted ones.
+        Cards rescheduled by hand in the browser are not picked up until they are reviewed, their note is edited or `sync_cache` is called.
+        '''
+        if self.cache is None:
+            return False
+        now = time.time()
+        decks_to_sync = [deck_name for deck_name in deck_names if full or now - self.cache.decks.get(deck_name, 0) >= self.min_sync_interval]
+        if decks_to_sync:
+            actions = []
+            incremental = dict()
+            for deck_name in decks_to_sync:
+                query = self._get_deck_query(deck_name)
+                actions.append(('findCards', {'query': query}))
+                last_sync = self.cache.decks.get(deck_name)
+                days = math.ceil((now - last_sync) / 86400) + 1 if last_sync is not None else None
+                incremental[deck_name] = not full and days is not None and days <= self._max_delta_days
+                if incremental[deck_name]:
+                    actions.append(('findCards', {'query': f'{query} (edited:{days} OR rated:{days} OR added:{days})'}))
+            # Find a review card of the decks due in the next week to learn Anki's number of today.
+            # Relearning cards also match is:review, but their `due` is a time in seconds, so the learning queues are left out.
+            probe_offsets = range(8)
+            decks_query = ' OR '.join(f'({self._get_deck_query(deck_name)})' for deck_name in decks_to_sync)
+            actions += [('findCards', {'query': f'({decks_query}) is:review -is:learn -is:suspended -is:buried prop:due={offset}'})
+                        for offset in probe_offsets]
+            results = iter(self.__invoke_multi(actions))
+            changed_card_ids = []
+            for deck_name in decks_to_sync:
+                all_card_ids = next(results)
+                self.cache.remove_missing(deck_name, all_card_ids)
+                if incremental[deck_name]:
+                    # Cards moved into the deck are not edited, so the ones missing from the mirror are fetched too
+                    cached_card_ids = self.cache.get_card_ids(deck_name)
+                    changed_card_ids += next(results) + [anki_card_id for anki_card_id in all_card_ids if str(anki_card_id) not in cached_card_ids]
+                else:
+                    changed_card_ids += all_card_ids
+            results = list(results)
+            probe = next(((offset, card_ids[0]) for offset, card_ids in zip(probe_offsets, results) if card_ids), None)
+            if probe is not None:
+                changed_card_ids.append(probe[1])
+            changed_card_ids = list(dict.fromkeys(changed_card_ids))
+            if changed_card_ids:
+                cards_info = [card for card in self.__invoke('cardsInfo', {'cards': changed_card_ids}) if card]
+                self.cache.update(cards_info, [self._extract_card_id_from_field(card['fields']['Back']['value']) for card in cards_info])
+            if probe is not None and self.cache.cards.get(str(probe[1]), {}).get('queue') == 2:
+                self.cache.day_number = self.cache.cards[str(probe[1])]['due'] - probe[0]
+                self.cache.day_number_date = str(self.cache.get_anki_date())
+            for deck_name in decks_to_sync:
+                self.cache.decks[deck_name] = now
+            self.cache.save()
+        return self.cache.get_today() is not None
+
+
     def __get_request(self, action, params):
         return {'action': action, 'params': params, 'version': 6}
 
 
     def __invoke(self, action, params):
         data = json.dumps(self.__get_request(action, params))
-        headers = {'Content-Type': 'application/json'}
-        response = requests.post(self.base_url, data=data, headers=headers)
+        response = self.session.post(self.base_url, data=data)
+        self.response_sizes.append((action, len(response.content)))
         response_json = response.json()
         if 'error' in response_json and response_json['error']:
             raise Exception(f'Failed to fetch card info: {response_json["error"]}')
         return response_json['result']
 
 
+    def __invoke_multi(self, actions:list) -> list:
+        '''
+        Sends the actions, a list of tuples (action, params), in a single request and returns their results in order.
+        '''
+        if not actions:
+            return []
+        results = self.__invoke('multi', {'actions': [self.__get_request(action, params) for action, params in actions]})
+        result_list = []
+        for result in results:
+            if isinstance(result, dict) and set(result.keys()) == {'result', 'error'}:
+                if result['error']:
+                    raise Exception(f'Failed to fetch card info: {result["error"]}')
+                result = result['result']
+            result_list.append(result)
+        return result_list
+
+
 class AnkiCardWriter(ABC):
     '''
     The writer takes a list of word entries as an input. The user can use the method `write_cards` to create a csv file that are suitable for Anki imports.
+    The rows are built one card at a time and written straight to the csv file, so only the card IDs are held in memory.
+    Alternatively, `write_package` creates an Anki package (.apkg) that updates the notes exported before instead of duplicating them.
+
+    Members:
+    package_model_name (str): The name of the Anki note type of the cards in the package. Every writer has its own, since the same card ID makes different notes.
     '''
+    package_model_name = 'English Vocab Builder'
+
     def __init__(self, stack: dict):
         self.stack = stack
-        self.anki_cards_front : list[str] = []
-        self.anki_cards_back : list[str] = []
-        self.Anki_cards_string: list[list[str]] = []
 
 
-    def write_cards(self, csv_path = str, shuffle_cards=True):
-        self.anki_cards_front, self.anki_cards_back = self._write_cards(self.stack)
-        for i in range(len(self.anki_cards_front)):
-            self.Anki_cards_string.append([self.anki_cards_front[i], self.anki_cards_back[i]])
+    def write_cards(self, csv_path: str, shuffle_cards=True):
+        card_ids = list(self.stack.keys())
         if shuffle_cards:
-            random.shuffle(self.Anki_cards_string)
+            # Shuffle the card IDs instead of the rows, which are only built while writing
+            random.shuffle(card_ids)
         with open(csv_path, 'w', encoding='utf-8') as file:
             writer = csv.writer(file, delimiter=';', quotechar='"', quoting=csv.QUOTE_ALL)
-            writer.writerows(self.Anki_cards_string)
+            writer.writerows(self._write_cards(self.stack, card_ids))
+
+
+    def write_package(self, apkg_path: str, deck_name: str, shuffle_cards=True) -> None:
+        card_ids = list(self.stack.keys())
+        if shuffle_cards:
+            random.shuffle(card_ids)
+        notes = ((card_id, front, back) for card_id, (front, back) in zip(card_ids, self._write_cards(self.stack, card_ids)))
+        package_writer = AnkiPackageWriter(apkg_path=apkg_path, deck_name=deck_name, model_name=self.package_model_name)
+        note_count = package_writer.write(notes)
+        print(f'Wrote {note_count} notes to {apkg_path}')
 
     @abstractmethod
-    def _write_cards(self, stack: dict):
+    def _write_cards(self, stack: dict, card_ids: list):
+        '''
+        Yields the row [front, back] of every card in `card_ids`, in that order.
+        '''
         pass
 
     
 
 class PassiveAnkiCardWriter(AnkiCardWriter):
+    package_model_name = 'English Vocab Builder (passive)'
+
     def __init__(self, stack):
         super().__init__(stack)
 
-    def _write_cards(self, stack: dict):
+    def _write_cards(self, stack: dict, card_ids: list):
         '''
-        Updates the list `self.Anki_cards`.
+        Yields the row [front, back] of every card in `card_ids`.
         '''
-        anki_card_front = []
-        anki_card_back = []
-        for card_id in stack:
-            front = ''
-            back = '<i>' + card_id + '</i>' + '<br>' + '<br>'
-            word = stack[card_id]['word']
-            forms = stack[card_id]['forms']
-            definition = stack[card_id]['definition']
-            Chinese_def = stack[card_id]['Chinese']
-            examples = stack[card_id]['examples']
-            part_of_speech = stack[card_id]['part of speech']
-            pronunciation = stack[card_id]['British received pronunciation']
+        for card_id in card_ids:
+            card = stack[card_id]
+            front = TextBuffer()
+            back = TextBuffer('<i>' + card_id + '</i>' + '<br>' + '<br>')
+            word = card['word']
+            forms = card['forms']
+            definition = card['definition']
+            Chinese_def = card['Chinese']
+            examples = card['examples']
+            part_of_speech = card['part of speech']
+            pronunciation = card['British received pronunciation']
             front += '<b>' + word + '</b>' + '<br>' + '<br>'
             for example in examples:
                 front += '<i>' + example['English'] + '</i>' + '<br>'
@@ -179,40 +634,41 @@ class PassiveAnkiCardWriter(AnkiCardWriter):
             back += (forms + '<br>' + '<br>') if forms else ''
             back += definition
             back += '<br>' + '<br>' + Chinese_def + '<br>' + '<br>'
-            anki_card_front.append(front)
-            anki_card_back.append(back)
-        return anki_card_front, anki_card_back
+            yield [str(front), str(back)]
     
     
 class ActiveAnkiCardWriter(AnkiCardWriter):
+    package_model_name = 'English Vocab Builder (active)'
+
     def __init__(self, stack):
         super().__init__(stack)
 
-    def _write_cards(self, stack: dict):
+    def _write_cards(self, stack: dict, card_ids: list):
         '''
-        Updates the list `self.Anki_cards`.
+        Yields the row [front, back] of every card in `card_ids`.
         '''
-        anki_card_front = []
-        anki_card_back = []
-        for card_id in stack:
+        for card_id in card_ids:
+            card = stack[card_id]
             front = ''
             back = '<i>' + card_id + '</i>' + '<br>' + '<br>'
-            word = stack[card_id]['word']
-            definition = stack[card_id]['definition']
-            assert len(stack[card_id]['examples']) > 0, f'No examples found for the word {word}'
-            example = stack[card_id]['examples'][0]
+            word = card['word']
+            definition = card['definition']
+            assert len(card['examples']) > 0, f'No examples found for the word {word}'
+            example = card['examples'][0]
             front += example['Chinese'] + '<br>' + '<br>'
             back += example['English'] + '<br>' + '<br>'
             back += '<b>' + word + '</b>' + '<br>' + '<br>'
             back += '<i>' + definition + '</i>'
-            anki_card_front.append(front)
-            anki_card_back.append(back)
-        return anki_card_front, anki_card_back
+            yield [front, back]
 
 
 class StackOrganizer:
+    '''
+    Groups the cards of a stack by their words. The organizer holds a read-only view of the stack, and the groups hold the cards as read-only `Card` records,
+    which are much smaller than the dictionaries of the json cards.
+    '''
     def __init__(self, stack: dict, only_single_word=False, only_multiple_word=False):
-        self.stack = deepcopy(stack)
+        self.stack = MappingProxyType(stack)
         self.only_single_word = only_single_word
         self.only_multiple_word = only_multiple_word
         assert not (only_single_word and only_multiple_word), 'You cannot set both only_single_word and only_multiple_word to True.'
@@ -223,7 +679,8 @@ class StackOrganizer:
     def _reorganize(self, stack: dict, only_single_word: bool, only_multiple_word: bool):
         result = {}
         for card_id in stack:
-            word = stack[card_id]['word']
+            card = stack[card_id]
+            word = card['word']
             word_count = len(word.split(' '))
             if only_single_word and word_count > 1:
                 continue
@@ -231,5 +688,5 @@ class StackOrganizer:
                 continue
             if word not in result:
                 result[word] = []
-            result[word].append(stack[card_id])
+            result[word].append(Card.from_dict(card))
         return result
\ No newline at end of file
@@ -1,7 +1,120 @@
 import json
 import re
-import spacy
-nlp = spacy.load('en_core_web_sm')
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from importlib import metadata
+from pathlib import Path
+
+spacy_model = 'en_core_web_sm'
+_nlp = None
+_nlp_lock = threading.Lock()
+token_cache_path = Path(__file__).parent / 'cache' / 'token_cache.jsonl'
+
+
+def get_nlp():
+    """
+    Returns the spaCy pipeline shared by the whole process. The model is loaded on first use, without the components that `replace_term` doesn't need (parser, NER).
+
+    Returns:
+        spacy.language.Language: The pipeline.
+    """
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                import spacy
+                _nlp = spacy.load(spacy_model, exclude=['parser', 'ner', 'senter'])
+    return _nlp
+
+
+class TokenCache:
+    """
+    An LRU cache of the tokens of sentences, keyed by the hash of the sentence and the name and version of the spaCy model.
+    A token is stored as a tuple (text, lemma, whitespace).
+
+    Attributes:
+        max_size (int): The maximum number of sentences kept in memory.
+        cache_path (Path): An optional json-lines file backing the cache. New entries are appended to it, and it is read back on the first `get` or `put`,
+            so importing this module stays cheap. The module-level `token_cache` is backed by `token_cache_path`, so the tokens are kept across sessions.
+    """
+    def __init__(self, max_size: int=100000, cache_path: str=None):
+        self.max_size = max_size
+        self.cache_path = Path(cache_path) if cache_path is not None else None
+        self.__entries = OrderedDict()
+        self.__model_key = None
+        self.__lock = threading.Lock()
+        self.__loaded = self.cache_path is None
+
+
+    def get(self, sentence: str):
+        key = self.__get_key(sentence)
+        with self.__lock:
+            self.__ensure_loaded()
+            tokens = self.__entries.get(key)
+            if tokens is not None:
+                self.__entries.move_to_end(key)
+        return tokens
+
+
+    def put(self, sentence: str, tokens: list) -> None:
+        key = self.__get_key(sentence)
+        with self.__lock:
+            self.__ensure_loaded()
+            self.__add(key, tokens)
+            if self.cache_path is not None:
+                with open(self.cache_path, 'a', encoding='utf-8') as file:
+                    file.write(json.dumps([key, tokens], ensure_ascii=False) + '\n')
+
+
+    def __add(self, key: str, tokens: list) -> None:
+        self.__entries[key] = tokens
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+
+
+    def __ensure_loaded(self) -> None:
+        if self.__loaded:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.cache_path.exists():
+            self.__load()
+        self.__loaded = True
+
+
+    def __load(self) -> None:
+        line_count = 0
+        with open(self.cache_path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    key, tokens = json.loads(line)
+                except ValueError:
+                    # The last line may have been cut off
+                    continue
+                self.__add(key, [tuple(token) for token in tokens])
+                line_count += 1
+        # Drop the evicted and duplicated lines once the file has grown well past the cache
+        if line_count > 2 * self.max_size:
+            tmp_path = self.cache_path.with_name(self.cache_path.name + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                for key, tokens in self.__entries.items():
+                    file.write(json.dumps([key, tokens], ensure_ascii=False) + '\n')
+            os.replace(tmp_path, self.cache_path)
+
+
+    def __get_key(self, sentence: str) -> str:
+        if self.__model_key is None:
+            try:
+                self.__model_key = f'{spacy_model}-{metadata.version(spacy_model)}'
+            except metadata.PackageNotFoundError:
+                self.__model_key = spacy_model
+        return hashlib.sha1(f'{self.__model_key}\n{sentence}'.encode('utf-8')).hexdigest()
+
+
+token_cache = TokenCache(cache_path=token_cache_path)
+
 
 def get_gap_length(text: str):
     """
@@ -41,7 +154,45 @@ def remove_brackets_and_contents(text):
 
 
 def replace_term(original_string: str, old_value: str, new_value: str):
-    doc = nlp(original_string)
+    return replace_terms([(original_string, old_value, new_value)])[0]
+
+
+def replace_terms(replacements: list, n_process: int=1, batch_size: int=256, cache: TokenCache=None):
+    """
+    Replaces terms in many sentences at once. The sentences that are not in the token cache are run through `nlp.pipe` in batches.
+
+    Args:
+        replacements (list): A list of tuples (original_string, old_value, new_value), as taken by `replace_term`.
+        n_process (int): The number of processes used by spaCy.
+        batch_size (int): The number of sentences per spaCy batch.
+        cache (TokenCache, optional): The token cache. Defaults to the module-level `token_cache`.
+
+    Returns:
+        list: The tuples (new_string, old_value_list) returned by `replace_term`, in the order of `replacements`.
+    """
+    if cache is None:
+        cache = token_cache
+    # Multi-word terms are replaced without spaCy
+    texts = [original_string for original_string, old_value, _ in replacements if '-' not in old_value]
+    tokens_by_text = dict()
+    for text in texts:
+        if text not in tokens_by_text:
+            tokens_by_text[text] = cache.get(text)
+    missing_texts = [text for text, tokens in tokens_by_text.items() if tokens is None]
+    if missing_texts:
+        docs = get_nlp().pipe(missing_texts, n_process=n_process, batch_size=batch_size)
+        for text, doc in zip(missing_texts, docs):
+            tokens = [(token.text, token.lemma_, token.whitespace_) for token in doc]
+            cache.put(text, tokens)
+            tokens_by_text[text] = tokens
+    results = []
+    for original_string, old_value, new_value in replacements:
+        tokens = tokens_by_text[original_string] if '-' not in old_value else None
+        results.append(_replace_term_in_tokens(tokens, original_string, old_value, new_value))
+    return results
+
+
+def _replace_term_in_tokens(tokens: list, original_string: str, old_value: str, new_value: str):
     new_string_list = []
     old_value_list = []
     # Handle the case where the old value is a multi-word term
@@ -58,13 +209,13 @@ def replace_term(original_string: str, old_value: str, new_value: str):
         else:
             new_string = ''
     else:
-        for token in doc:
-            if token.lemma_.lower() == old_value or token.text.lower() == old_value:
-                new_string_list.append(new_value + token.whitespace_)
+        for text, lemma, whitespace in tokens:
+            if lemma.lower() == old_value or text.lower() == old_value:
+                new_string_list.append(new_value + whitespace)
                 # Append the solution to a list
-                old_value_list.append(token.text)
+                old_value_list.append(text)
             else: 
-                new_string_list.append(token.text_with_ws)
+                new_string_list.append(text + whitespace)
         if new_string_list:
             new_string = ''.join(new_string_list)
         else:
@@ -132,37 +283,74 @@ def partition_list(letters:list, unit_size:int=5):
     return formatted_output
 
 
+class TextBuffer:
+    '''
+    An append-only text buffer. `buffer += text` appends the piece to a list instead of copying the whole text, and the pieces are joined
+    only when the text is needed, e.g. when a template renders it. Rendering and writing can also go through the pieces one by one.
+
+    Members:
+    pieces (list): The pieces of text, in order.
+    '''
+    def __init__(self, *pieces):
+        self.pieces = list(pieces)
+
+
+    def write(self, *pieces) -> None:
+        self.pieces.extend(pieces)
+
+
+    def __iadd__(self, piece:str):
+        self.pieces.append(piece)
+        return self
+
+
+    def __iter__(self):
+        return iter(self.pieces)
+
+
+    def __str__(self) -> str:
+        return ''.join(self.pieces)
+
+
+# The characters replaced by `string_processing_for_latex`, found in one scan of the text
+_latex_pattern = re.compile(r"""['"‘’“”–£&%#_]""")
+_latex_replacements = {
+    "'": "'",
+    '’': "'",
+    '‘': "'",
+    '"': '"',
+    '“': '"',
+    '”': '"',
+    '–': '--',
+    '£': '\\pounds',
+    '&': '\\&',
+    '%': '\\%',
+    '#': '\\#',
+    '_': '\\_'
+}
+_latex_single_quotes = {"'", '’', '‘'}
+_latex_double_quotes = {'"', '“', '”'}
+
+
+def _replace_latex_character(match):
+    character = match.group()
+    if character not in _latex_single_quotes and character not in _latex_double_quotes:
+        return _latex_replacements[character]
+    # Quotes at the start of a word open, double quotes at the end of a word close
+    text = match.string
+    start = match.start()
+    if start == 0 or text[start - 1] == ' ':
+        return '``' if character in _latex_double_quotes else '`'
+    if character in _latex_double_quotes and (start + 1 == len(text) or text[start + 1] == ' '):
+        return "''"
+    return _latex_replacements[character]
+
+
 def string_processing_for_latex(text):
     '''
-    Parse strings
+    Parse strings: unify the quotes and turn them into LaTeX quotes, replace en-dashes and pounds, and escape & % # _
     '''
-    # Unify quotes
-    text = text.replace("’", "'")
-    text = text.replace("‘", "'")
-    text = text.replace("“", '"')
-    text = text.replace("”", '"')
-
-    # Replace en-dashes
-    text = text.replace('–', '--')
-
-    # Replace quotes
-    text_list = text.split(' ')
-    text_list_new = []
-    for word in text_list:
-        if word.startswith("'"):
-            word = '`' + word[1:]
-        if word.startswith('"'):
-            word = '``' + word[1:]
-        if word.endswith('"'):
-            word = word[:-1] + "''"
-        text_list_new.append(word)
-
-    text = ' '.join(text_list_new)
-
-    # Replace pounds
-    text = text.replace('£', '\\pounds')
-
-    return text
+    return _latex_pattern.sub(_replace_latex_character, text)
 
 
 def int_to_roman(num):
@@ -0,0 +1,210 @@
+import json
+import re
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+import pytest
+
+sys.path.insert(1, str(Path(__file__).parents[1] / 'src'))
+
+
+class FakeAnki:
+    '''
+    A small AnkiConnect server on a local port, which searches a list of cards the way Anki does for the queries used by `AnkiCommunicator`.
+
+    Members:
+    url (str): The url of the server.
+    cards (dict): For every Anki card ID, its deck, Back field, type, queue, due value and interval, and whether it changed since the last sync.
+    today (int): Anki's number of today.
+    requests (list): The actions of every request received, e.g. 'multi'.
+    actions (list): The actions run, including the ones inside `multi`.
+    fetched_cards (list): The Anki card IDs of every `cardsInfo`, one list per action.
+    '''
+    def __init__(self):
+        self.cards = dict()
+        self.today = 1000
+        self.requests = []
+        self.actions = []
+        self.fetched_cards = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                fake.requests.append(request['action'])
+                try:
+                    response = {'result': fake.handle(request['action'], request.get('params', dict())), 'error': None}
+                except Exception as error:
+                    response = {'result': None, 'error': str(error)}
+                body = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+    def add_card(self, anki_card_id:int, deck:str, card_id:str, due_in:int=0, card_type:int=2, queue:int=2, interval:int=3) -> None:
+        '''
+        Adds a card. The `due` of the learning queue (1) is a time in seconds `due_in` from now, the others are a day number `due_in` from today.
+        '''
+        due = int(time.time()) + due_in if queue == 1 else self.today + due_in
+        self.cards[anki_card_id] = {'deck': deck, 'back': f'<i>{card_id}</i><br><br>definition', 'type': card_type, 'queue': queue,
+                                    'due': due, 'interval': interval, 'changed': True}
+
+
+    def mark_synced(self) -> None:
+        '''
+        Marks every card as unchanged, so that only the cards changed afterwards match the `edited`, `rated` and `added` searches.
+        '''
+        for card in self.cards.values():
+            card['changed'] = False
+
+
+    def handle(self, action:str, params:dict):
+        self.actions.append(action)
+        if action == 'multi':
+            return [{'result': self.handle(item['action'], item.get('params', dict())), 'error': None} for item in params['actions']]
+        if action in ('findCards', 'findNotes'):
+            return [anki_card_id for anki_card_id, card in self.cards.items() if self.__matches(card, params['query'])]
+        if action == 'cardsInfo':
+            self.fetched_cards.append(params['cards'])
+            return [self.__get_card_info(anki_card_id) if anki_card_id in self.cards else dict() for anki_card_id in params['cards']]
+        if action == 'notesInfo':
+            return [{'noteId': anki_card_id, 'modelName': 'Basic', 'tags': [], 'cards': [anki_card_id], 'fields': self.__get_fields(anki_card_id)}
+                    for anki_card_id in params['notes']]
+        raise Exception(f'unsupported action {action}')
+
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+    def __get_fields(self, anki_card_id:int) -> dict:
+        card = self.cards[anki_card_id]
+        return {'Front': {'value': f'<b>word {anki_card_id}</b>', 'order': 0}, 'Back': {'value': card['back'], 'order': 1}}
+
+
+    def __get_card_info(self, anki_card_id:int) -> dict:
+        card = self.cards[anki_card_id]
+        fields = self.__get_fields(anki_card_id)
+        return {'cardId': anki_card_id, 'note': anki_card_id, 'deckName': card['deck'], 'modelName': 'Basic', 'fields': fields,
+                'question': fields['Front']['value'], 'answer': fields['Front']['value'] + '<hr id=answer>' + fields['Back']['value'],
+                'css': '.card {\n font-family: arial;\n font-size: 20px;\n text-align: center;\n}\n',
+                'type': card['type'], 'queue': card['queue'], 'due': card['due'], 'interval': card['interval']}
+
+
+    def __matches(self, card:dict, query:str) -> bool:
+        # Only the decks themselves are searched, as in `AnkiCommunicator._get_deck_query`
+        decks = re.findall(r'(?<!-)deck:"([^"]*)"', query)
+        if decks and card['deck'] not in decks:
+            return False
+        if '(edited:' in query and not card['changed']:
+            return False
+        if 'is:review' in query and card['type'] not in (2, 3):
+            return False
+        if '-is:learn' in query and card['queue'] in (1, 3):
+            return False
+        if '-is:suspended' in query and card['queue'] == -1:
+            return False
+        if '-is:buried' in query and card['queue'] in (-2, -3):
+            return False
+        days = self.__get_days_until_due(card)
+        if 'is:due' in query and (days is None or days > 0):
+            return False
+        prop_due = re.search(r'prop:due=(-?\d+)', query)
+        if prop_due is not None and days != int(prop_due.group(1)):
+            return False
+        return True
+
+
+    def __get_days_until_due(self, card:dict):
+        # Like Anki, prop:due also matches the cards of the learning queue, whose `due` is a time in seconds
+        if card['queue'] in (2, 3):
+            return card['due'] - self.today
+        if card['queue'] == 1:
+            return int((card['due'] - time.time()) // 86400)
+        return None
+
+
+class StubCollins:
+    '''
+    A small stand-in for the Collins API on a local port, which answers `search/first` with a short entry for every word.
+
+    Members:
+    url (str): The base url of the API.
+    failures (dict): For some words, the HTTP statuses returned, one per request, before the entry is returned.
+    not_found (set): The words answered with the error of the API for unknown words.
+    requests (list): The tuples (time.monotonic(), word) of every request received.
+    '''
+    def __init__(self):
+        self.failures = dict()
+        self.not_found = set()
+        self.requests = []
+        self.__lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                word = parse_qs(urlsplit(self.path).query)['q'][0]
+                status, body = stub.handle(word)
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/api/v1'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+    def handle(self, word:str):
+        with self.__lock:
+            self.requests.append((time.monotonic(), word))
+            failures = self.failures.get(word)
+            if failures:
+                return failures.pop(0), {'errorCode': 'Error', 'errorMessage': 'Try again later'}
+        if word in self.not_found:
+            return 200, {'errorCode': 'SearchNotFound', 'errorMessage': f'No entry found matching supplied source_lang, word {word}'}
+        return 200, {'entryContent': f'<h1 class="hwd">{word}</h1><span class="orth">{word}s</span><div class="hom"><span class="pos">noun</span>'
+                                     f'<span class="def">The definition of {word}.</span><span class="quote">An example of {word}.</span></div>'}
+
+
+    def get_requests(self, word:str) -> list:
+        return [request_time for request_time, requested_word in self.requests if requested_word == word]
+
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_collins():
+    stub = StubCollins()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def fake_anki():
+    fake = FakeAnki()
+    yield fake
+    fake.close()
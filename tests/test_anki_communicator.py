@@ -0,0 +1,85 @@
+from datetime import date, timedelta
+
+from toolboxes import AnkiCommunicator
+
+
+deck = 'Vocab Builder'
+
+
+def test_probe_ignores_relearning_cards(fake_anki, tmp_path):
+    # A lapsed card is relearnt in the learning queue, where it matches is:review and prop:due=0
+    fake_anki.add_card(1, deck, 'lapsed-v', due_in=600, card_type=3, queue=1)
+    fake_anki.add_card(2, deck, 'abate-v', due_in=2)
+    fake_anki.add_card(3, deck, 'bask-v', due_in=0)
+    anki = AnkiCommunicator(base_url=fake_anki.url, cache_path=tmp_path / 'cache.json')
+    assert anki.get_words_in_n_days(2, deck) == ['abate-v']
+    assert anki.cache.day_number == fake_anki.today
+    assert anki.get_words_for_today(deck) == ['bask-v']
+
+
+def test_day_number_date_follows_rollover(fake_anki, tmp_path):
+    fake_anki.add_card(1, deck, 'abate-v', due_in=1)
+    # With the next day starting at midnight tomorrow, Anki's today is still yesterday
+    anki = AnkiCommunicator(base_url=fake_anki.url, cache_path=tmp_path / 'cache.json', rollover_hour=24)
+    assert anki.get_words_for_tomorrow(deck) == ['abate-v']
+    assert anki.cache.day_number_date == str(date.today() - timedelta(days=1))
+    assert anki.cache.get_today() == fake_anki.today
+
+
+def test_decks_are_queried_in_two_round_trips(fake_anki):
+    decks = ['Vocab Builder', 'NCE3', 'Empty']
+    fake_anki.add_card(1, 'Vocab Builder', 'abate-v', due_in=1)
+    fake_anki.add_card(2, 'Vocab Builder', 'bask-v', due_in=2)
+    fake_anki.add_card(3, 'NCE3', 'cede-v', due_in=1)
+    fake_anki.add_card(4, 'Vocab Builder::Subdeck', 'deft-a', due_in=1)
+    anki = AnkiCommunicator(base_url=fake_anki.url)
+    assert anki.get_words_for_tomorrow_in_decks(decks) == {'Vocab Builder': ['abate-v'], 'NCE3': ['cede-v'], 'Empty': []}
+    assert fake_anki.requests == ['multi', 'multi']
+    # The deck without due notes is left out of the second round trip
+    assert fake_anki.actions == ['multi', 'findNotes', 'findNotes', 'findNotes', 'multi', 'notesInfo', 'notesInfo']
+    assert [action for action, _ in anki.response_sizes] == ['multi', 'multi']
+
+
+def test_no_notes_take_one_round_trip(fake_anki):
+    fake_anki.add_card(1, deck, 'abate-v', due_in=3)
+    anki = AnkiCommunicator(base_url=fake_anki.url)
+    assert anki.get_words_for_today_in_decks([deck, 'NCE3']) == {deck: [], 'NCE3': []}
+    assert fake_anki.requests == ['multi']
+
+
+def test_sync_only_fetches_changed_cards(fake_anki, tmp_path):
+    fake_anki.add_card(1, deck, 'abate-v', due_in=0)
+    fake_anki.add_card(2, deck, 'bask-v', due_in=1)
+    fake_anki.add_card(3, deck, 'cede-v', due_in=2)
+    fake_anki.add_card(4, deck, 'deft-a', due_in=3)
+    fake_anki.add_card(5, 'Other', 'ebb-v', due_in=1)
+    anki = AnkiCommunicator(base_url=fake_anki.url, cache_path=tmp_path / 'cache.json', min_sync_interval=0)
+    assert anki.get_words_for_tomorrow(deck) == ['bask-v']
+    assert sorted(fake_anki.fetched_cards[-1]) == [1, 2, 3, 4]
+
+    fake_anki.mark_synced()
+    # Reviewed, moved into the deck without being edited, and deleted
+    fake_anki.cards[3].update(due=fake_anki.today + 1, changed=True)
+    fake_anki.cards[5]['deck'] = deck
+    del fake_anki.cards[4]
+    assert sorted(AnkiCommunicator(base_url=fake_anki.url, cache_path=tmp_path / 'cache.json', min_sync_interval=0)
+                  .get_words_for_tomorrow(deck)) == ['bask-v', 'cede-v', 'ebb-v']
+    # Besides the changed cards, only the card found by the probe for the day number is fetched
+    assert sorted(fake_anki.fetched_cards[-1]) == [1, 3, 5]
+    cache = AnkiCommunicator(base_url=fake_anki.url, cache_path=tmp_path / 'cache.json').cache
+    assert sorted(cache.cards) == ['1', '2', '3', '5']
+    assert cache.cards['3']['due'] == fake_anki.today + 1
+
+
+def test_recent_sync_is_not_repeated(fake_anki, tmp_path):
+    fake_anki.add_card(1, deck, 'abate-v', due_in=1)
+    anki = AnkiCommunicator(base_url=fake_anki.url, cache_path=tmp_path / 'cache.json', min_sync_interval=3600)
+    assert anki.get_words_for_tomorrow(deck) == ['abate-v']
+    request_count = len(fake_anki.requests)
+    fake_anki.cards[1].update(due=fake_anki.today + 2, changed=True)
+    assert anki.get_words_for_tomorrow(deck) == ['abate-v']
+    assert len(fake_anki.requests) == request_count
+    # A sync by hand fetches every card of the deck
+    anki.sync_cache([deck])
+    assert fake_anki.fetched_cards[-1] == [1]
+    assert anki.get_words_in_n_days(2, deck) == ['abate-v']
@@ -0,0 +1,43 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(1, str(Path(__file__).parents[1] / 'src'))
+
+import Collins
+from Collins import Collins_entry
+
+
+# Every fixture holds a response of the Collins API (`raw_entry`) and the expected result of `Collins_entry.parse` (`parsed`).
+# The responses are synthetic: they were written by hand after the markup of the `entryContent` of the API, not saved from it.
+# A real response can be added from the `raw_entry` of a record of a `CollinsCache`.
+fixtures_folder = Path(__file__).parent / 'fixtures' / 'collins'
+fixture_paths = sorted(fixtures_folder.glob('*.json'))
+
+
+def load_fixture(fixture_path:Path) -> dict:
+    with open(fixture_path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+@pytest.mark.parametrize('fixture_path', fixture_paths, ids=lambda path: path.stem)
+def test_parse(fixture_path):
+    fixture = load_fixture(fixture_path)
+    assert Collins_entry(fixture_path.stem).parse(fixture['raw_entry']) == fixture['parsed']
+
+
+@pytest.mark.parametrize('fixture_path', fixture_paths, ids=lambda path: path.stem)
+def test_parse_with_soup(fixture_path):
+    fixture = load_fixture(fixture_path)
+    entry = Collins_entry(fixture_path.stem)
+    assert entry._Collins_entry__parse_with_soup(fixture['raw_entry']['entryContent']) == fixture['parsed']
+
+
+@pytest.mark.skipif(Collins.lxml_html is None, reason='lxml is not installed')
+@pytest.mark.parametrize('fixture_path', fixture_paths, ids=lambda path: path.stem)
+def test_parse_with_lxml(fixture_path):
+    fixture = load_fixture(fixture_path)
+    entry = Collins_entry(fixture_path.stem)
+    assert entry._Collins_entry__parse_with_lxml(fixture['raw_entry']['entryContent']) == fixture['parsed']
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from Collins import CollinsCache, CollinsSession, Collins_entry, Collins_writer, collins_dictionary_code
+
+
+def make_writer(tmp_path, stub_collins, **kwargs) -> Collins_writer:
+    return Collins_writer(dictionary_path=tmp_path / 'Collins.json', session=CollinsSession(api_key='test', base_url=stub_collins.url),
+                          cache=CollinsCache(cache_dir=tmp_path / 'cache'), **kwargs)
+
+
+def test_requests_are_rate_limited(tmp_path, stub_collins):
+    words = ['bank', 'river', 'stone', 'cloud', 'grass', 'table']
+    writer = make_writer(tmp_path, stub_collins, requests_per_second=20, burst=1)
+    writer.look_up(words)
+    request_times = sorted(request_time for request_time, _ in stub_collins.requests)
+    assert len(request_times) == len(words)
+    # One request every 1/20 s, with some slack for the clock
+    assert all(later - earlier > 0.04 for earlier, later in zip(request_times, request_times[1:]))
+    with open(tmp_path / 'Collins.json') as file:
+        assert sorted(json.load(file)) == sorted(words)
+    assert (tmp_path / 'Collins.json.journal').read_text() == ''
+
+
+def test_failed_requests_are_retried_with_backoff(tmp_path, stub_collins):
+    stub_collins.failures['bank'] = [503, 429]
+    cache = CollinsCache(cache_dir=tmp_path / 'cache')
+    entry = Collins_entry('bank').look_up(session=CollinsSession(api_key='test', base_url=stub_collins.url), max_retries=3, backoff=0.05, cache=cache)
+    assert entry['word'] == 'bank'
+    request_times = stub_collins.get_requests('bank')
+    assert len(request_times) == 3
+    # The delay doubles after every retry
+    assert request_times[1] - request_times[0] >= 0.05
+    assert request_times[2] - request_times[1] >= 0.1
+    assert cache.get(collins_dictionary_code, 'bank')['entryContent'].startswith('<h1 class="hwd">bank</h1>')
+
+
+def test_exhausted_retries_raise_and_are_not_cached(tmp_path, stub_collins):
+    stub_collins.failures['bank'] = [503] * 3
+    cache = CollinsCache(cache_dir=tmp_path / 'cache')
+    with pytest.raises(Exception, match='HTTP 503'):
+        Collins_entry('bank').look_up(session=CollinsSession(api_key='test', base_url=stub_collins.url), max_retries=2, backoff=0.01, cache=cache)
+    assert len(stub_collins.get_requests('bank')) == 3
+    assert cache.get(collins_dictionary_code, 'bank') is None
+
+
+def test_failed_and_missing_words_are_skipped(tmp_path, stub_collins):
+    stub_collins.failures['bank'] = [500]
+    stub_collins.not_found.add('qwzx')
+    writer = make_writer(tmp_path, stub_collins, requests_per_second=100, max_retries=0)
+    writer.look_up(['bank', 'river', 'qwzx'])
+    with open(tmp_path / 'Collins.json') as file:
+        dictionary = json.load(file)
+    assert list(dictionary) == ['river']
+    assert dictionary['river'][1][0]['definition'] == 'The definition of river.'
+    # A word that failed is looked up again by the next batch, a cached one is not
+    writer.look_up(['bank', 'river'])
+    assert len(stub_collins.get_requests('bank')) == 2
+    assert len(stub_collins.get_requests('river')) == 1
+    assert 'bank' in writer.dic
+
+
+def test_journal_is_replayed_and_compacted(tmp_path, stub_collins):
+    with open(tmp_path / 'Collins.json', 'w') as file:
+        json.dump({'bank': ['banks', []]}, file)
+    with open(tmp_path / 'Collins.json.journal', 'w') as file:
+        file.write(json.dumps({'river': ['rivers', []]}) + '\n')
+        file.write(json.dumps({'stone': ['stones', []]}) + '\n')
+        # The line being written when the batch crashed
+        file.write(json.dumps({'cloud': ['clouds', []]})[:10])
+    writer = make_writer(tmp_path, stub_collins)
+    assert sorted(writer.dic) == ['bank', 'river', 'stone']
+    with open(tmp_path / 'Collins.json') as file:
+        assert json.load(file) == writer.dic
+    assert (tmp_path / 'Collins.json.journal').read_text() == ''
+    # The entries that were recovered are not looked up again
+    writer.look_up(['river', 'stone', 'cloud'])
+    assert [word for _, word in stub_collins.requests] == ['cloud']
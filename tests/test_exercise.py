@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(1, str(Path(__file__).parents[1] / 'src'))
+
+import utils
+from Exercise import CollocationFillInTheGap
+
+
+def test_collocation_with_latex_characters(monkeypatch):
+    # The tokens of the collocations are taken from the cache, so the spaCy model isn't needed
+    cache = utils.TokenCache()
+    cache.put('a 50% rise', [('a', 'a', ' '), ('50', '50', ''), ('%', '%', ' '), ('rise', 'rise', '')])
+    cache.put('rock & roll', [('rock', 'rock', ' '), ('&', '&', ' '), ('roll', 'roll', '')])
+    monkeypatch.setattr(utils, 'token_cache', cache)
+    dicts = [
+        {'key': 'rise', 'category': 'adjective', 'matching part': 'a 50% rise', 'new example': 'Prices saw a 50% rise last year.'},
+        {'key': 'roll', 'category': 'noun', 'matching part': 'rock & roll', 'new example': 'She grew up on rock & roll.'}
+    ]
+    exercise = CollocationFillInTheGap.__new__(CollocationFillInTheGap)
+    ex, sol = exercise._generate_exercise(dicts=dicts)
+    questions = sorted(str(ex).splitlines())
+    assert questions == [
+        f'\\question  \\textit{{[adjective]}} Prices saw a 50\\% \\fillin[rise][{utils.get_gap_length("rise"):.2f}in] last year.',
+        f'\\question  \\textit{{[noun]}} She grew up on rock \\& \\fillin[roll][{utils.get_gap_length("roll"):.2f}in].'
+    ]
+    assert sorted(str(sol).splitlines()[1:-1]) == ['\\item rise', '\\item roll']
@@ -0,0 +1,24 @@
+from ExerciseWriter import ExerciseWriter
+from VocabNotes import VocabNotes
+
+
+def make_word_entries(n:int) -> dict:
+    return {f'word{i}': [{'word': f'word{i}', 'part of speech': 'noun', 'British received pronunciation': 'wɜːd', 'forms': 'words',
+                          'definition': f'The definition of the word {i}.', 'Chinese': '词', 'explanation': '',
+                          'examples': [{'English': f'An example of the word {i}.', 'Chinese': '例子'}],
+                          'collocations': {'verb': [{'key': 'use', 'example': {'English': 'Use the word.', 'Chinese': '用'}}]},
+                          'patterns': [{'usage': 'word of', 'example': {'English': 'A word of advice.', 'Chinese': '建议'}}]}]
+            for i in range(n)}
+
+
+def test_render_template_streams_streaming_notes(tmp_path):
+    word_entries = make_word_entries(3)
+    (tmp_path / 'notes').mkdir()
+    (tmp_path / 'streamed').mkdir()
+    ExerciseWriter(template_path='/Definition/template.tex', output_folder=tmp_path / 'notes').render_template(
+        exercise=VocabNotes(word_entries=word_entries), set_index=1)
+    ExerciseWriter(template_path='/Definition/template.tex', output_folder=tmp_path / 'streamed').render_template(
+        exercise=VocabNotes(word_entries=word_entries, streaming=True), set_index=1)
+    rendered = (tmp_path / 'streamed' / 'output_1.tex').read_text()
+    assert 'generator object' not in rendered
+    assert rendered == (tmp_path / 'notes' / 'output_1.tex').read_text()
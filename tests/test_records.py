@@ -0,0 +1,37 @@
+import json
+from copy import deepcopy
+
+import pytest
+
+from Records import Card, DefinitionEntry
+
+card_json = {'word': 'abate', 'part of speech': 'verb', 'British received pronunciation': 'əˈbeɪt', 'forms': 'abates, abating, abated',
+             'definition': 'to become less strong', 'Chinese': '减弱', 'explanation': '', 'source': 'Collins',
+             'examples': [{'English': 'The storm abated.', 'Chinese': '暴风雨减弱了。'}],
+             'collocations': {'adverb': [{'key': 'gradually', 'example': {'English': 'The pain gradually abated.', 'Chinese': '疼痛逐渐减轻了。'}}]},
+             'patterns': [{'usage': 'abate something', 'example': {'English': 'Nothing could abate his anger.', 'Chinese': '什么都无法平息他的愤怒。'}}]}
+
+
+def test_card_round_trip():
+    card = Card.from_dict(card_json)
+    assert card['examples'][0]['English'] == 'The storm abated.'
+    assert card['collocations']['adverb'][0]['key'] == 'gradually'
+    assert card.extra == {'source': 'Collins'}
+    assert card.to_dict() == card_json
+    assert json.loads(json.dumps(card.to_dict())) == card_json
+
+
+def test_card_is_immutable():
+    card = Card.from_dict(card_json)
+    assert isinstance(card['examples'], tuple)
+    assert isinstance(card['patterns'], tuple)
+    assert isinstance(card['collocations']['adverb'], tuple)
+    with pytest.raises(TypeError):
+        card['collocations']['noun'] = ()
+    with pytest.raises(AttributeError):
+        card.word = 'abet'
+    # A read-only record is shared instead of copied
+    assert deepcopy(card) is card
+    entry = DefinitionEntry.from_dict({'part of speech': 'verb', 'definition': 'to become less strong', 'examples': ['The storm abated.']})
+    assert entry['examples'] == ('The storm abated.',)
+    assert deepcopy([entry])[0] is entry
@@ -0,0 +1,64 @@
+import json
+from datetime import date, timedelta
+
+from Stack import CardStore, Stack
+from toolboxes import Configurator
+
+
+def make_schedule(tmp_path, unlearned_count:int=100):
+    schedule = {'learned': ['old-a', 'old-b'], 'unlearned': [f'word{i:03d}-n' for i in range(unlearned_count)], 'last learned': [],
+                'last timestamp': '2000-01-01', 'timestamp': '2000-01-01'}
+    schedule_path = tmp_path / 'schedule.json'
+    with open(schedule_path, 'w') as file:
+        json.dump(schedule, file)
+    store_path = tmp_path / 'cards.sqlite'
+    CardStore(store_path).close()
+    return schedule_path, store_path
+
+
+def assert_same_schedule(configurator:Configurator, reloaded:Configurator):
+    assert list(reloaded.learned) == list(configurator.learned)
+    assert list(reloaded.unlearned) == list(configurator.unlearned)
+    assert reloaded.reviews == configurator.reviews
+    assert reloaded.config['timestamp'] == configurator.config['timestamp']
+    assert reloaded.config['last learned'] == configurator.config['last learned']
+
+
+def test_schedule_steps_only_write_their_rows(tmp_path):
+    schedule_path, store_path = make_schedule(tmp_path)
+    schedule_json = schedule_path.read_text()
+    configurator = Configurator(json_path=schedule_path, store_path=store_path)
+    # The learned cards without a review state were given one, which is saved
+    assert Configurator(json_path=schedule_path, store_path=store_path).reviews == configurator.reviews
+
+    changes = configurator.store.connection.total_changes
+    configurator.study_n_words(10)
+    # 10 cards moved to the learned words, their 10 review states and the 3 values of the schedule
+    assert configurator.store.connection.total_changes - changes == 23
+    assert_same_schedule(configurator, Configurator(json_path=schedule_path, store_path=store_path))
+
+    configurator.review('word000-n', quality=5)
+    assert Configurator(json_path=schedule_path, store_path=store_path).reviews['word000-n']['due'] == str(date.today() + timedelta(days=1))
+
+    configurator.revert_last_study()
+    reloaded = Configurator(json_path=schedule_path, store_path=store_path)
+    assert_same_schedule(configurator, reloaded)
+    assert list(reloaded.unlearned)[:10] == [f'word{i:03d}-n' for i in range(10)]
+    assert list(reloaded.learned) == ['old-a', 'old-b']
+    # The json file is only read to migrate the schedule
+    assert schedule_path.read_text() == schedule_json
+
+
+def test_imported_cards_are_appended_to_the_stored_schedule(tmp_path):
+    schedule_path, store_path = make_schedule(tmp_path, unlearned_count=3)
+    cards_path = tmp_path / 'cards.json'
+    with open(cards_path, 'w') as file:
+        json.dump(dict(), file)
+    notes_path = tmp_path / 'notes.json'
+    with open(notes_path, 'w') as file:
+        json.dump({'new-n': {'word': 'new'}}, file)
+    stack = Stack(schedule_path=schedule_path, cards_path=cards_path, store_path=store_path)
+    stack.import_cards(json_path=notes_path)
+    configurator = Configurator(json_path=schedule_path, store_path=store_path)
+    assert list(configurator.unlearned) == ['word000-n', 'word001-n', 'word002-n', 'new-n']
+    assert stack.cards['new-n'] == {'word': 'new'}
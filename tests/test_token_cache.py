@@ -0,0 +1,11 @@
+from utils import TokenCache
+
+
+def test_disk_cache_is_loaded_on_first_use(tmp_path):
+    cache_path = tmp_path / 'cache' / 'token_cache.jsonl'
+    cache = TokenCache(cache_path=cache_path)
+    # Creating the cache doesn't touch the disk
+    assert not cache_path.parent.exists()
+    cache.put('A test sentence.', [('A', 'a', ' '), ('test', 'test', ' '), ('sentence', 'sentence', ''), ('.', '.', '')])
+    assert cache_path.exists()
+    assert TokenCache(cache_path=cache_path).get('A test sentence.')[1] == ('test', 'test', ' ')